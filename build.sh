@@ -10,6 +10,9 @@ python manage.py collectstatic --no-input
 echo "Running migrations..."
 python manage.py migrate
 
+echo "Rebuilding search index..."
+python manage.py rebuild_search_index
+
 echo "Creating admin user..."
 python manage.py create_admin || echo "Admin creation skipped"
 
@@ -2,13 +2,19 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
 from django.urls import path
-from django.shortcuts import render
+from django.shortcuts import render, redirect
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
 from django.contrib.admin import AdminSite
 from .models import (
     Category, Store, Coupon, SliderItem, Favorite,
     Notification, UserNotification, AppSettings, CouponUsage,
-    UserProfile, ContactMessage
+    UserProfile, ContactMessage, UsageRollup
 )
+from .listings import with_active_coupons_count
+from .analytics import WINDOWS, DEFAULT_WINDOW, get_report
+from .exports import streaming_response
+from .imports import detect_format, import_coupons
 
 
 # ==================== Guide View ====================
@@ -17,6 +23,26 @@ def admin_guide_view(request):
     return render(request, 'admin/guide.html')
 
 
+# ==================== Analytics View ====================
+def admin_analytics_view(request):
+    """صفحة التحليلات (من جداول الملخص اليومي)"""
+    try:
+        days = int(request.GET.get('days', DEFAULT_WINDOW))
+    except ValueError:
+        days = DEFAULT_WINDOW
+    if days not in WINDOWS:
+        days = DEFAULT_WINDOW
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'التحليلات',
+        'days': days,
+        'windows': WINDOWS,
+        'report': get_report(days),
+    }
+    return render(request, 'admin/analytics.html', context)
+
+
 # ==================== Category Admin ====================
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -48,10 +74,14 @@ class CategoryAdmin(admin.ModelAdmin):
         return "—"
     icon_preview.short_description = 'الأيقونة'
     
+    def get_queryset(self, request):
+        return with_active_coupons_count(super().get_queryset(request))
+    
     def coupons_count(self, obj):
         count = obj.active_coupons_count
         return format_html('<span style="background: #27ae60; color: white; padding: 3px 10px; border-radius: 10px;">{}</span>', count)
     coupons_count.short_description = 'الكوبونات'
+    coupons_count.admin_order_field = 'num_active_coupons'
 
 
 # ==================== Store Admin ====================
@@ -95,11 +125,15 @@ class StoreAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #ccc;"><i class="fas fa-store"></i></span>')
     logo_preview.short_description = 'الشعار'
     
+    def get_queryset(self, request):
+        return with_active_coupons_count(super().get_queryset(request))
+    
     def coupons_count(self, obj):
         count = obj.active_coupons_count
         color = '#27ae60' if count > 0 else '#ccc'
         return format_html('<span style="background: {}; color: white; padding: 3px 10px; border-radius: 10px;">{}</span>', color, count)
     coupons_count.short_description = 'الكوبونات'
+    coupons_count.admin_order_field = 'num_active_coupons'
 
 
 # ==================== Coupon Admin ====================
@@ -180,6 +214,45 @@ class CouponAdmin(admin.ModelAdmin):
         return format_html(' '.join(badges)) if badges else '—'
     status_badges.short_description = 'التصنيف'
 
+    # ---------- Bulk import (core.imports) ----------
+    change_list_template = 'admin/core/coupon/change_list.html'
+
+    def get_urls(self):
+        custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='core_coupon_import'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        if request.method == 'POST' and request.FILES.get('feed'):
+            feed = request.FILES['feed']
+            dry_run = bool(request.POST.get('dry_run'))
+            try:
+                stats = import_coupons(feed.file, detect_format(feed.name), dry_run=dry_run)
+            except ValueError as exc:
+                self.message_user(request, f'❌ فشل الاستيراد: {exc}', level=messages.ERROR)
+            else:
+                prefix = '🔎 تجربة فقط: ' if dry_run else '✅ '
+                self.message_user(
+                    request,
+                    f"{prefix}{stats['created']} جديد، {stats['updated']} محدث، "
+                    f"{stats['unchanged']} بدون تغيير، {stats['skipped']} متجاهل"
+                )
+                for line, message in stats['errors'][:10]:
+                    self.message_user(request, f'⚠️ سطر {line}: {message}', level=messages.WARNING)
+                if not dry_run:
+                    return redirect('admin:core_coupon_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'استيراد الكوبونات',
+            'opts': self.model._meta,
+        }
+        return render(request, 'admin/core/coupon/import.html', context)
+
 
 # ==================== Slider Admin ====================
 @admin.register(SliderItem)
@@ -339,6 +412,33 @@ class CouponUsageAdmin(admin.ModelAdmin):
     search_fields = ['coupon__code', 'user__username']
     readonly_fields = ['coupon', 'user', 'action', 'ip_address', 'user_agent', 'device_type', 'created_at']
     date_hierarchy = 'created_at'
+    list_select_related = ['coupon__store', 'user']
+    # The raw log is huge: skip the unfiltered COUNT(*); totals live in UsageRollup
+    show_full_result_count = False
+    actions = ['export_csv', 'export_jsonl']
+
+    def export_csv(self, request, queryset):
+        return streaming_response(queryset, 'csv')
+    export_csv.short_description = '📥 تصدير المحدد (CSV)'
+
+    def export_jsonl(self, request, queryset):
+        return streaming_response(queryset, 'jsonl')
+    export_jsonl.short_description = '📥 تصدير المحدد (JSON Lines)'
+
+
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'coupon', 'store', 'action', 'device_type', 'count']
+    list_filter = ['action', 'device_type', 'day']
+    search_fields = ['coupon__code', 'store__name']
+    list_select_related = ['coupon__store', 'store']
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(UserProfile)
@@ -383,16 +483,6 @@ class ContactMessageAdmin(admin.ModelAdmin):
     replied_badge.short_description = 'الرد'
 
 
-# ==================== Custom Admin URLs ====================
-class CustomAdminSite(admin.AdminSite):
-    def get_urls(self):
-        urls = super().get_urls()
-        custom_urls = [
-            path('guide/', self.admin_view(admin_guide_view), name='admin_guide'),
-        ]
-        return custom_urls + urls
-
-
 # ==================== Admin Site Config ====================
 admin.site.site_header = '🎫 لوحة تحكم الكوبونات'
 admin.site.site_title = 'إدارة الكوبونات'
@@ -0,0 +1,89 @@
+"""
+Usage analytics for the admin dashboard.
+
+Everything is aggregated in the database over the UsageRollup table (one
+conditional-SUM GROUP BY per table), never over the raw CouponUsage log.
+Reports are cached per window until the rollups are refreshed.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import get_version
+from .models import Category, UsageRollup
+from .rollups import WATERMARK
+
+WINDOWS = (7, 30, 90)
+DEFAULT_WINDOW = 30
+TOP_N = 10
+CACHE_TIMEOUT = 600
+
+
+def _action_sums():
+    return {
+        name: Coalesce(Sum('count', filter=Q(action=action)), 0)
+        for name, action in (('views', 'view'), ('clicks', 'click'), ('copies', 'copy'))
+    }
+
+
+def _with_rates(row):
+    row['conversion'] = round(100 * row['copies'] / row['views'], 1) if row['views'] else None
+    return row
+
+
+def _top(queryset, *fields):
+    rows = queryset.values(*fields).annotate(**_action_sums()).order_by('-copies', '-clicks')[:TOP_N]
+    return [_with_rates(row) for row in rows]
+
+
+def _top_categories(rollups):
+    # Grouped by id (two categories may share a name); names are looked up after
+    rows = _top(rollups, 'coupon__category_id')
+    names = dict(Category.objects.filter(
+        id__in=[row['coupon__category_id'] for row in rows]
+    ).values_list('id', 'name'))
+    for row in rows:
+        row['category_name'] = names.get(row['coupon__category_id'])
+    return rows
+
+
+def build_report(days):
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    rollups = UsageRollup.objects.filter(day__gte=start, day__lte=end)
+
+    by_day = {row['day']: row for row in rollups.values('day').annotate(**_action_sums()).order_by()}
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day, {'views': 0, 'clicks': 0, 'copies': 0})
+        series.append({'day': day, 'views': row['views'], 'clicks': row['clicks'], 'copies': row['copies']})
+    peak = max((row['views'] + row['clicks'] + row['copies'] for row in series), default=0)
+    for row in series:
+        total = row['views'] + row['clicks'] + row['copies']
+        row['percent'] = round(100 * total / peak) if peak else 0
+
+    return {
+        'start': start,
+        'end': end,
+        'totals': _with_rates(rollups.aggregate(**_action_sums())),
+        'series': series,
+        'top_coupons': _top(rollups, 'coupon_id', 'coupon__code', 'coupon__title', 'store__name'),
+        'top_stores': _top(rollups, 'store_id', 'store__name'),
+        'top_categories': _top_categories(rollups),
+        'by_device': _top(rollups, 'device_type'),
+        'generated_at': timezone.now(),
+    }
+
+
+def get_report(days):
+    """``build_report(days)`` cached until the day changes or the rollups are refreshed."""
+    key = f'core:analytics:{days}:{timezone.localdate().isoformat()}:{get_version(WATERMARK)}'
+    report = cache.get(key)
+    if report is None:
+        report = build_report(days)
+        cache.set(key, report, CACHE_TIMEOUT)
+    return report
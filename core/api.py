@@ -0,0 +1,182 @@
+"""
+Read-only JSON API (v1) for the mobile app.
+
+Rows are fetched with ``values()`` (no model instances) and projected to a
+fixed set of public field names; ``?fields=a,b`` narrows the projection.
+Every response carries an ETag derived from the catalog versions, so a
+revalidation is answered with 304 before any query runs, and bodies are
+gzipped. ``/api/v1/home/`` returns everything the homepage shows in one
+round trip.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+
+from . import trending
+from .cache import CATALOG_MODELS, get_versions
+from .listings import active_coupons, with_active_coupons_count
+from .models import AppSettings, Category, SliderItem, Store
+from .pagination import KeysetPaginator
+from .search import search_coupons, search_stores
+
+MAX_PAGE_SIZE = 50
+HOME_CACHE_TIMEOUT = 600
+
+# Public name -> ORM path
+CATEGORY_FIELDS = {
+    'id': 'id', 'slug': 'slug', 'name': 'name', 'name_en': 'name_en',
+    'icon': 'icon', 'image': 'image', 'coupons_count': 'num_active_coupons',
+}
+STORE_FIELDS = {
+    'id': 'id', 'slug': 'slug', 'name': 'name', 'name_en': 'name_en', 'logo': 'logo',
+    'url': 'url', 'description': 'description', 'description_en': 'description_en',
+    'is_featured': 'is_featured', 'coupons_count': 'num_active_coupons',
+}
+STORE_DETAIL_FIELDS = {**STORE_FIELDS, 'cover_image': 'cover_image'}
+COUPON_FIELDS = {
+    'id': 'id', 'title': 'title', 'title_en': 'title_en', 'code': 'code',
+    'discount_percentage': 'discount_percentage', 'discount_value': 'discount_value',
+    'description': 'description', 'description_en': 'description_en',
+    'expiry_date': 'expiry_date', 'affiliate_url': 'affiliate_url',
+    'is_best_offer': 'is_best_offer', 'is_exclusive': 'is_exclusive', 'is_verified': 'is_verified',
+    'store': 'store__slug', 'store_name': 'store__name', 'store_name_en': 'store__name_en',
+    'store_logo': 'store__logo', 'category': 'category__slug',
+}
+SLIDER_FIELDS = {
+    'id': 'id', 'title': 'title', 'title_en': 'title_en', 'subtitle': 'subtitle',
+    'subtitle_en': 'subtitle_en', 'image': 'image', 'link': 'link',
+    'button_text': 'button_text', 'button_text_en': 'button_text_en',
+}
+SETTINGS_FIELDS = [
+    'app_name', 'app_name_en', 'primary_color', 'secondary_color', 'accent_color',
+    'default_language', 'enable_english', 'enable_registration', 'enable_favorites',
+    'enable_notifications', 'maintenance_mode', 'maintenance_message',
+    'play_store_url', 'app_store_url',
+]
+IMAGE_FIELDS = {'image', 'logo', 'store_logo', 'cover_image'}
+
+
+# ==================== Helpers ====================
+def _select(request, fields):
+    """The subset of ``fields`` named in ``?fields=`` (all of them by default)."""
+    wanted = [name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()]
+    selected = {name: fields[name] for name in wanted if name in fields}
+    return selected or fields
+
+
+def _project(rows, fields):
+    items = []
+    for row in rows:
+        item = {}
+        for name, path in fields.items():
+            value = row[path]
+            if name in IMAGE_FIELDS:
+                value = default_storage.url(value) if value else None
+            item[name] = value
+        items.append(item)
+    return items
+
+
+def _rows(queryset, fields):
+    return _project(queryset.values(*fields.values()), fields)
+
+
+def _page(request, queryset, fields, per_page):
+    try:
+        per_page = min(max(int(request.GET.get('limit', per_page)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        pass
+    paginator = KeysetPaginator(queryset, per_page, values=fields.values())
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': _project(page, fields),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _json(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _etag(request, *args, **kwargs):
+    """Changes whenever anything the API returns can have changed."""
+    versions = get_versions(*[f'catalog.{name}' for name in CATALOG_MODELS], 'app_settings', 'trending')
+    key = request.get_full_path() + repr(sorted(versions.items()))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def api_view(view):
+    """GET only, 304 on a matching If-None-Match, gzip, short public max-age."""
+    return require_GET(gzip_page(cache_control(public=True, max_age=60)(condition(etag_func=_etag)(view))))
+
+
+# ==================== Endpoints ====================
+@api_view
+def home(request):
+    key = f'core:api:home:{_etag(request)}'
+    data = cache.get(key)
+    if data is None:
+        settings = AppSettings.get_cached()
+        coupon_fields = _select(request, COUPON_FIELDS)
+        data = {
+            'settings': {name: getattr(settings, name) for name in SETTINGS_FIELDS},
+            'slider': _rows(SliderItem.objects.filter(is_active=True)[:5], SLIDER_FIELDS),
+            'categories': _rows(with_active_coupons_count(Category.objects.filter(is_active=True))[:8], CATEGORY_FIELDS),
+            'best_coupons': _rows(active_coupons().filter(is_best_offer=True)[:8], coupon_fields),
+            'most_used_coupons': _rows(trending.trending_coupons(8), coupon_fields),
+            'latest_coupons': _rows(active_coupons().order_by('-created_at')[:8], coupon_fields),
+            'featured_stores': _rows(
+                with_active_coupons_count(Store.objects.filter(is_active=True, is_featured=True))[:8],
+                STORE_FIELDS,
+            ),
+        }
+        cache.set(key, data, HOME_CACHE_TIMEOUT)
+    return _json(data)
+
+
+@api_view
+def categories(request):
+    queryset = with_active_coupons_count(Category.objects.filter(is_active=True))
+    return _json({'results': _rows(queryset, _select(request, CATEGORY_FIELDS))})
+
+
+@api_view
+def stores(request):
+    queryset = with_active_coupons_count(Store.objects.filter(is_active=True))
+    if request.GET.get('q'):
+        queryset = search_stores(queryset, request.GET['q'])
+    settings = AppSettings.get_cached()
+    return _json(_page(request, queryset, _select(request, STORE_FIELDS), settings.stores_per_page))
+
+
+@api_view
+def store_detail(request, slug):
+    store = with_active_coupons_count(Store.objects.filter(slug=slug, is_active=True))
+    found = _rows(store, STORE_DETAIL_FIELDS)
+    if not found:
+        raise Http404
+    coupons = active_coupons().filter(store__slug=slug)
+    settings = AppSettings.get_cached()
+    return _json({
+        'store': found[0],
+        'coupons': _page(request, coupons, _select(request, COUPON_FIELDS), settings.coupons_per_page),
+    })
+
+
+@api_view
+def coupons(request):
+    queryset = active_coupons()
+    if request.GET.get('category'):
+        queryset = queryset.filter(category__slug=request.GET['category'])
+    if request.GET.get('store'):
+        queryset = queryset.filter(store__slug=request.GET['store'])
+    if request.GET.get('q'):
+        queryset = search_coupons(queryset, request.GET['q'])
+    settings = AppSettings.get_cached()
+    return _json(_page(request, queryset, _select(request, COUPON_FIELDS), settings.coupons_per_page))
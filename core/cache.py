@@ -0,0 +1,117 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+
+# How long a process trusts its local copy before re-checking the shared
+# version counter. Keeps hot reads free of any cache round-trip.
+LOCAL_RECHECK_SECONDS = getattr(settings, 'LOCAL_CACHE_RECHECK_SECONDS', 5)
+
+_local = {}
+
+# Counters are kept in their own cache so culling other entries never resets them
+version_cache = ConnectionProxy(caches, 'versions')
+
+
+def _version_key(name):
+    return f'core:version:{name}'
+
+
+def _initial_version():
+    # A lost counter restarts above any number it can have reached, so entries
+    # cached under old versions never become current again
+    return int(time.time())
+
+
+def get_version(name):
+    """Current version of a named cache namespace (shared by all workers)."""
+    key = _version_key(name)
+    version = version_cache.get(key)
+    if version is None:
+        version_cache.add(key, _initial_version(), None)
+        version = version_cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    """Versions of several namespaces in one cache round-trip."""
+    keys = {_version_key(name): name for name in names}
+    found = version_cache.get_many(list(keys))
+    versions = {}
+    for key, name in keys.items():
+        versions[name] = found[key] if key in found else get_version(name)
+    return versions
+
+
+def bump_version(name):
+    """Invalidate everything cached under ``name`` in every worker."""
+    _local.pop(name, None)
+    key = _version_key(name)
+    try:
+        return version_cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        version_cache.set(key, version, None)
+        return version
+
+
+def get_local(name, loader):
+    """Return ``loader()`` memoized in this process until ``name`` is bumped."""
+    now = time.monotonic()
+    entry = _local.get(name)
+    if entry is not None and now - entry['checked_at'] < LOCAL_RECHECK_SECONDS:
+        return entry['value']
+
+    version = get_version(name)
+    if entry is not None and entry['version'] == version:
+        entry['checked_at'] = now
+        return entry['value']
+
+    value = loader()
+    _local[name] = {'version': version, 'value': value, 'checked_at': now}
+    return value
+
+
+# ==================== App Settings ====================
+def get_app_settings():
+    """AppSettings singleton served from process memory (no query on hit)."""
+    from .models import AppSettings
+    return get_local('app_settings', AppSettings.get_settings)
+
+
+def invalidate_app_settings():
+    bump_version('app_settings')
+    touch_catalog()
+
+
+# ==================== Catalog versions ====================
+# Bumped from Category/Store/Coupon/SliderItem save and delete signals
+CATALOG_MODELS = ('category', 'store', 'coupon', 'slideritem')
+
+
+def get_catalog_versions():
+    versions = get_versions(*[f'catalog.{name}' for name in CATALOG_MODELS])
+    return {name.split('.', 1)[1]: version for name, version in versions.items()}
+
+
+def bump_catalog_version(model_name):
+    bump_version(f'catalog.{model_name}')
+    touch_catalog()
+
+
+# When the catalog or settings last changed (Last-Modified of the catalog pages)
+CATALOG_CHANGED_AT = 'core:catalog:changed_at'
+
+
+def touch_catalog():
+    version_cache.set(CATALOG_CHANGED_AT, int(time.time()), None)
+
+
+def get_catalog_changed_at():
+    changed_at = version_cache.get(CATALOG_CHANGED_AT)
+    if changed_at is None:
+        version_cache.add(CATALOG_CHANGED_AT, int(time.time()), None)
+        changed_at = version_cache.get(CATALOG_CHANGED_AT)
+    return changed_at
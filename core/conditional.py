@@ -0,0 +1,85 @@
+"""
+Conditional GET for the public catalog pages.
+
+The validator for a page is derived from the catalog change counters (see
+``core.cache``), the time they last moved, the session language and the full
+path. Revalidations that match are answered with 304 before the view runs,
+so no queries or template rendering happen. Responses that set a cookie
+(a first visit's CSRF or session cookie) are only cacheable privately.
+
+Only anonymous requests are handled: logged-in pages show favorites and
+notification counts, and a page with pending flash messages must be
+rendered so the messages are shown (and consumed).
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache import CATALOG_MODELS, get_catalog_changed_at, get_versions
+
+MAX_AGE = getattr(settings, 'CATALOG_CACHE_MAX_AGE', 60)
+
+
+def catalog_state():
+    """``(versions, last_modified)`` of the catalog and settings; no queries."""
+    versions = get_versions(*[f'catalog.{name}' for name in CATALOG_MODELS], 'app_settings')
+    return versions, get_catalog_changed_at()
+
+
+def sets_cookie(request, response):
+    """Whether the middleware will add a Set-Cookie to ``response``."""
+    return bool(
+        response.cookies
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        or getattr(request, 'session', None) is not None and request.session.modified
+    )
+
+
+def has_pending_messages(request):
+    # len() loads the stored messages without marking them as shown
+    return bool(len(get_messages(request)))
+
+
+def conditional_page(view=None, not_modified=None):
+    """
+    ETag/Last-Modified and public Cache-Control for an anonymous catalog
+    page. ``not_modified(request, *args, **kwargs)`` runs when a 304 is
+    returned instead of the view (e.g. to keep counting visits).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or has_pending_messages(request)):
+                return view(request, *args, **kwargs)
+
+            versions, last_modified = catalog_state()
+            key = [request.get_full_path(), request.session.get('language'), last_modified]
+            key += [versions[name] for name in sorted(versions)]
+            etag = quote_etag(hashlib.md5(repr(key).encode()).hexdigest())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            elif response.status_code == 304 and not_modified is not None:
+                not_modified(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified:
+                    response['Last-Modified'] = http_date(last_modified)
+                if sets_cookie(request, response):
+                    # A shared cache would hand this visitor's cookie to everyone
+                    patch_cache_control(response, private=True, max_age=MAX_AGE)
+                else:
+                    patch_cache_control(response, public=True, max_age=MAX_AGE)
+            return response
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
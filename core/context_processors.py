@@ -1,20 +1,25 @@
-from .models import AppSettings, Category, UserNotification
+from django.middleware.csrf import get_token
+
+from .models import AppSettings, Category
+from .notifications import get_unread_count
 
 
 def global_settings(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     categories = Category.objects.filter(is_active=True)[:10]
     
     # Get current language
     lang = request.session.get('language', settings.default_language)
     
+    # Copy buttons read the CSRF token from its cookie (see base.html), so issue
+    # one to new visitors; returning ones keep theirs and pages stay shareable
+    if 'CSRF_COOKIE' not in request.META:
+        get_token(request)
+    
     # Get unread notifications count
     unread_notifications = 0
     if request.user.is_authenticated:
-        unread_notifications = UserNotification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
+        unread_notifications = get_unread_count(request.user)
     
     return {
         'app_settings': settings,
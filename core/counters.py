@@ -0,0 +1,105 @@
+"""
+Write-behind buffer for the hot counter columns.
+
+Views call ``increment()`` which only touches process memory; a background
+thread flushes the accumulated deltas as ``UPDATE ... SET col = col + n``
+statements (one per model/field/delta group), and the buffer is flushed
+once more when the worker exits.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+
+# Only these columns may be buffered (the ones the views increment)
+COUNTER_FIELDS = {
+    'core.Store': {'click_count'},
+    'core.Coupon': {'used_count'},
+}
+
+_lock = threading.Lock()
+_pending = defaultdict(int)
+_flusher = None
+
+
+def increment(instance, field, amount=1):
+    """Queue ``field += amount`` for a model instance."""
+    label = instance._meta.label
+    if field not in COUNTER_FIELDS.get(label, ()):
+        raise ValueError(f'{label}.{field} is not a buffered counter')
+
+    with _lock:
+        _pending[(instance.__class__, field, instance.pk)] += amount
+    _ensure_flusher()
+
+
+def pending(instance, field):
+    """Increments for ``instance.field`` not yet written to the database."""
+    with _lock:
+        return _pending.get((instance.__class__, field, instance.pk), 0)
+
+
+def flush():
+    """Write all buffered increments. Returns the number of rows updated."""
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    # Group rows that get the same delta so each group is a single UPDATE
+    groups = defaultdict(list)
+    for (model, field, pk), amount in batch.items():
+        groups[(model, field, amount)].append(pk)
+
+    updated = 0
+    try:
+        with transaction.atomic():
+            for (model, field, amount), pks in groups.items():
+                updated += model.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+    except Exception:
+        logger.exception('Counter flush failed, re-queueing %d increments', len(batch))
+        with _lock:
+            for key, amount in batch.items():
+                _pending[key] += amount
+        return 0
+    return updated
+
+
+def _run_flusher():
+    stop = _flusher['stop']
+    while not stop.wait(FLUSH_INTERVAL):
+        flush()
+        close_old_connections()
+
+
+def _ensure_flusher():
+    # Started lazily so it lives in the gunicorn worker, not the master
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = {'stop': threading.Event()}
+        thread = threading.Thread(target=_run_flusher, name='counter-flusher', daemon=True)
+        _flusher['thread'] = thread
+        thread.start()
+
+
+def shutdown():
+    """Stop the background flusher and write whatever is still buffered."""
+    if _flusher is not None:
+        _flusher['stop'].set()
+    flush()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,110 @@
+"""
+Streaming export of CouponUsage rows as CSV or JSON lines.
+
+Rows are read in primary-key order with keyset chunks (``id > last``), so
+memory stays flat, no long-running transaction or cursor is held, and the
+first bytes go out before the whole log has been read.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import CouponUsage
+
+CHUNK_SIZE = 2000
+
+COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('coupon_id', 'coupon_id'),
+    ('coupon_code', 'coupon__code'),
+    ('store', 'coupon__store__slug'),
+    ('action', 'action'),
+    ('device_type', 'device_type'),
+    ('user_id', 'user_id'),
+    ('ip_address', 'ip_address'),
+    ('user_agent', 'user_agent'),
+]
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def usage_queryset(start=None, end=None, store=None, action=None):
+    """CouponUsage filtered by local date range (inclusive), store slug and action."""
+    queryset = CouponUsage.objects.all()
+    if start:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if store:
+        queryset = queryset.filter(coupon__store__slug=store)
+    if action:
+        queryset = queryset.filter(action=action)
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield export tuples from ``queryset`` one keyset chunk at a time."""
+    fields = [field for _, field in COLUMNS]
+    queryset = queryset.order_by('id').values_list(*fields)
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1][0]
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# A cell starting with one of these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    value = _serialize(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object whose write() just returns the line (for csv.writer)."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def jsonl_lines(rows):
+    names = [name for name, _ in COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, map(_serialize, row))), ensure_ascii=False) + '\n'
+
+
+def export_lines(queryset, fmt='csv'):
+    rows = iter_rows(queryset)
+    return csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+
+
+def streaming_response(queryset, fmt='csv'):
+    response = StreamingHttpResponse(export_lines(queryset, fmt), content_type=FORMATS[fmt])
+    filename = f"coupon-usage-{timezone.localdate().isoformat()}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
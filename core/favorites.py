@@ -0,0 +1,42 @@
+from django.core.cache import cache
+
+from .models import Favorite
+
+FAVORITES_TIMEOUT = 60 * 60 * 24
+
+
+def _key(user_id):
+    return f'core:favorites:{user_id}'
+
+
+def get_favorite_ids(user):
+    """The user's favorite coupon ids as a set (cached, O(1) membership)."""
+    if not user.is_authenticated:
+        return set()
+    key = _key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = set(Favorite.objects.filter(user=user).values_list('coupon_id', flat=True))
+        cache.set(key, ids, FAVORITES_TIMEOUT)
+    return ids
+
+
+def _update(user_id, coupon_id, add):
+    # Only patch a set that is already cached; a miss reloads from the DB
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        return
+    if add:
+        ids.add(coupon_id)
+    else:
+        ids.discard(coupon_id)
+    cache.set(key, ids, FAVORITES_TIMEOUT)
+
+
+def favorite_added(user_id, coupon_id):
+    _update(user_id, coupon_id, add=True)
+
+
+def favorite_removed(user_id, coupon_id):
+    _update(user_id, coupon_id, add=False)
@@ -0,0 +1,174 @@
+"""
+Resized/WebP derivatives of uploaded images.
+
+Each image field has a preset (a set of widths). For every width we store
+a WebP file and a JPEG/PNG fallback next to the media files under
+``derived/<width>/<original name>.<format>``. Derivatives are generated when
+the object is saved and, for files uploaded before this existed, lazily on
+first render; the files on disk are the cache. Templates use the ``picture`` tag from
+``core.templatetags.images`` to emit ``srcset``s pointing at them.
+"""
+import logging
+import threading
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+PRESETS = {
+    # Logos and category icons are shown at 50-120px
+    'logo': {'widths': (64, 128, 256), 'square': True, 'sizes': '80px'},
+    # Full-width backgrounds (store cover, hero slider)
+    'cover': {'widths': (640, 1280, 1920), 'square': False, 'sizes': '100vw'},
+}
+
+# model name -> {image field: preset}
+IMAGE_FIELDS = {
+    'store': {'logo': 'logo', 'cover_image': 'cover'},
+    'category': {'image': 'logo'},
+    'coupon': {'image': 'logo'},
+    'slideritem': {'image': 'cover'},
+    'notification': {'image': 'logo'},
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# A generate() that failed (storage or decoder error) is retried after this long
+RETRY_AFTER = 60
+
+# (image name, preset) -> list of variants; the files themselves are the real cache
+_variants = {}
+# (image name, preset) -> time.monotonic() before which a failed image isn't retried
+_failed = {}
+# (image name, preset) -> lock, so different images are generated in parallel
+_locks = {}
+_lock = threading.Lock()
+
+
+def derivative_name(name, width, fmt):
+    # The original extension stays in the name so logo.png and logo.jpg don't collide
+    return f'derived/{width}/{name}.{fmt}'
+
+
+def _working_mode(image):
+    if image.mode in ('RGB', 'RGBA', 'L', 'LA'):
+        return image.mode
+    return 'RGBA' if 'transparency' in image.info or image.mode == 'P' else 'RGB'
+
+
+def _fallback_format(mode):
+    # Keep transparency for logos uploaded as PNG/GIF/WebP
+    return 'png' if mode in ('RGBA', 'LA') else 'jpg'
+
+
+def _upright_width(image):
+    # From the header's EXIF: getexif() on a PNG decodes the whole file to look for it
+    exif = Image.Exif()
+    if 'exif' in image.info:
+        exif.load(image.info['exif'])
+    # exif_transpose() swaps the sides for these orientations
+    orientation = exif.get(ExifTags.Base.Orientation)
+    return image.height if orientation in (5, 6, 7, 8) else image.width
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _write_missing(storage, original, settings, targets, fallback, missing):
+    original = ImageOps.exif_transpose(original)
+    if original.mode != _working_mode(original):
+        original = original.convert(_working_mode(original))
+    for width, *pair in targets:
+        box = (width, width if settings['square'] else width * 4)
+        resized = None
+        for fmt, target in zip(('webp', fallback), pair):
+            if target in missing:
+                if resized is None:
+                    resized = original.copy()
+                    resized.thumbnail(box, Image.LANCZOS)
+                storage.save(target, ContentFile(_encode(resized, fmt)))
+
+
+def generate(field_file, preset):
+    """
+    Write any missing derivatives of ``field_file`` and return its variants
+    as ``[(width, webp_url, fallback_url), ...]``: empty if it is not an
+    image (or is animated), None if reading or writing failed.
+    The original is only decoded when a derivative is missing.
+    """
+    storage, name = field_file.storage, field_file.name
+    settings = PRESETS[preset]
+    try:
+        with storage.open(name, 'rb') as fh:
+            # Image.open() reads the header only
+            original = Image.open(fh)
+            if getattr(original, 'is_animated', False):
+                return []
+            fallback = _fallback_format(_working_mode(original))
+            # Never upscale: keep the widths the original can fill, or the smallest one
+            width = _upright_width(original)
+            widths = [w for w in settings['widths'] if w <= width] or [settings['widths'][0]]
+            targets = [(w, derivative_name(name, w, 'webp'), derivative_name(name, w, fallback)) for w in widths]
+            missing = {target for _, *pair in targets for target in pair if not storage.exists(target)}
+            if missing:
+                original.load()
+        if missing:
+            _write_missing(storage, original, settings, targets, fallback, missing)
+    except UnidentifiedImageError:
+        logger.warning('%s is not an image, serving it without derivatives', name)
+        return []
+    except (OSError, ValueError):
+        logger.warning('Cannot make derivatives of %s', name, exc_info=True)
+        return None
+
+    return [(width, storage.url(webp), storage.url(fallback_name)) for width, webp, fallback_name in targets]
+
+
+def _key_lock(key):
+    with _lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def variants(field_file, preset):
+    """
+    Cached ``generate()``: one disk check per image per process. A failed
+    image gets no derivatives (the original is served) until RETRY_AFTER.
+    """
+    key = (field_file.name, preset)
+    found = _variants.get(key)
+    if found is not None:
+        return found
+    with _key_lock(key):
+        found = _variants.get(key)
+        if found is not None:
+            return found
+        if _failed.get(key, 0) > time.monotonic():
+            return []
+        found = generate(field_file, preset)
+        if found is None:
+            _failed[key] = time.monotonic() + RETRY_AFTER
+            return []
+        _failed.pop(key, None)
+        _variants[key] = found
+    return found
+
+
+def generate_for(instance):
+    """Derivatives of every image field of a Store/Category/Coupon/SliderItem."""
+    fields = IMAGE_FIELDS.get(instance._meta.model_name, {})
+    for field, preset in fields.items():
+        field_file = getattr(instance, field)
+        if field_file:
+            variants(field_file, preset)
@@ -0,0 +1,298 @@
+"""
+Bulk coupon import from affiliate feeds (CSV, JSON lines or a JSON array).
+
+Rows are streamed from the file and handled in batches: store/category
+slugs are resolved through in-memory maps, existing coupons are matched on
+(store, code) with one query per batch, and the batch is written with
+``bulk_create``/``bulk_update``. Bulk writes skip model signals, so the
+search index, typeahead and catalog versions are refreshed explicitly.
+"""
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from . import search, typeahead
+from .cache import bump_catalog_version
+from .models import Category, Coupon, Store
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'نعم'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'لا', ''}
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _positive_int(value):
+    value = _text(value)
+    number = int(value) if value else 0
+    if number < 0:
+        raise ValueError(f'must not be negative: {value}')
+    return number
+
+
+def _decimal(value):
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'invalid number: {value}')
+
+
+def _date(value):
+    value = _text(value)
+    return date.fromisoformat(value) if value else None
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    value = _text(value).lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'invalid boolean: {value}')
+
+
+# Feed column -> parser; "store" (slug), "code" and "category" (slug) are handled separately
+FIELDS = {
+    'title': _text,
+    'title_en': _text,
+    'description': _text,
+    'description_en': _text,
+    'affiliate_url': _text,
+    'discount_percentage': _positive_int,
+    'discount_value': _decimal,
+    'expiry_date': _date,
+    'is_active': _bool,
+    'is_best_offer': _bool,
+    'is_exclusive': _bool,
+    'is_verified': _bool,
+}
+
+# Model fields the parsed values are validated against (max_length, ranges, digits, URLs)
+MODEL_FIELDS = {field: Coupon._meta.get_field(field) for field in [*FIELDS, 'code']}
+
+# Changes to these need the coupon's search terms rebuilt
+SEARCH_FIELDS = {'title', 'title_en', 'description', 'description_en', 'is_active'}
+
+
+# ==================== Reading ====================
+def detect_format(filename):
+    name = filename.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.json'):
+        return 'json'
+    raise ValueError(f'Unsupported feed type: {filename} (use .csv, .jsonl or .json)')
+
+
+class RowError(ValueError):
+    """A feed line that could not be read; reported like an invalid row."""
+
+
+def read_rows(fileobj, fmt):
+    """
+    Yield ``(line_number, row)`` from a text or binary file object. A JSON
+    lines entry that doesn't parse is yielded as a ``RowError`` so the import
+    reports it and goes on.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(fileobj, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    row = RowError(f'invalid JSON: {exc.msg} (column {exc.colno})')
+                yield number, row
+    else:
+        # A JSON array can't be streamed with the stdlib; feeds this large should use JSON lines
+        try:
+            rows = json.load(fileobj)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f'invalid JSON: {exc}')
+        if not isinstance(rows, list):
+            raise ValueError(f'a JSON feed must be an array of coupon objects, not {type(rows).__name__}')
+        for number, row in enumerate(rows, 1):
+            yield number, row
+
+
+# ==================== Importing ====================
+class CouponImporter:
+    def __init__(self, dry_run=False, batch_size=BATCH_SIZE, progress=None):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stores = dict(Store.objects.values_list('slug', 'id'))
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'errors': []}
+        self.touched_ids = []
+
+    def _error(self, line, message):
+        self.stats['skipped'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            self.stats['errors'].append((line, message))
+
+    def _parse(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise ValueError(f'expected an object, got {type(row).__name__}')
+        store_slug, code = _text(row.get('store')), _text(row.get('code'))
+        if not store_slug or not code:
+            raise ValueError('store and code are required')
+        if store_slug not in self.stores:
+            raise ValueError(f'unknown store: {store_slug}')
+
+        values = {}
+        for field, parse in FIELDS.items():
+            if field in row:
+                try:
+                    values[field] = parse(row[field])
+                except ValueError as exc:
+                    raise ValueError(f'{field}: {exc}')
+        for field, value in [('code', code), *values.items()]:
+            try:
+                MODEL_FIELDS[field].clean(value, None)
+            except ValidationError as exc:
+                raise ValueError(f"{field}: {' '.join(exc.messages)}")
+        if 'category' in row:
+            category_slug = _text(row['category'])
+            if category_slug and category_slug not in self.categories:
+                raise ValueError(f'unknown category: {category_slug}')
+            values['category_id'] = self.categories.get(category_slug)
+        return (self.stores[store_slug], code), values
+
+    def _write_each(self, to_create, to_update, fields, lines):
+        """Write one coupon at a time after a failed bulk write, reporting the rows the database rejects."""
+        created, updated = [], []
+        for adding, coupon in [(True, c) for c in to_create] + [(False, c) for c in to_update]:
+            if adding:
+                coupon.pk = None
+            try:
+                with transaction.atomic():
+                    if adding:
+                        Coupon.objects.bulk_create([coupon])
+                    else:
+                        Coupon.objects.bulk_update([coupon], fields)
+            except DatabaseError as exc:
+                self._error(lines[(coupon.store_id, coupon.code)], f'database error: {exc}')
+                continue
+            (created if adding else updated).append(coupon)
+        return created, updated
+
+    def _write_batch(self, batch):
+        parsed, lines = {}, {}
+        for line, row in batch:
+            try:
+                key, values = self._parse(row)
+            except (ValueError, TypeError) as exc:
+                self._error(line, str(exc))
+                continue
+            # A later row for the same (store, code) wins
+            parsed.setdefault(key, {}).update(values)
+            lines[key] = line
+        if not parsed:
+            return
+
+        existing = {}
+        for coupon in Coupon.objects.filter(
+            store_id__in={store_id for store_id, _ in parsed},
+            code__in={code for _, code in parsed},
+        ).order_by('-id'):
+            existing[(coupon.store_id, coupon.code)] = coupon
+
+        to_create, to_update, fields, reindex = [], [], {'updated_at'}, []
+        now = timezone.now()
+        for (store_id, code), values in parsed.items():
+            coupon = existing.get((store_id, code))
+            if coupon is None:
+                values.setdefault('title', code)
+                to_create.append(Coupon(store_id=store_id, code=code, **values))
+                continue
+            # Feeds mostly resend unchanged coupons: only write the fields that differ
+            changed = {field for field, value in values.items() if getattr(coupon, field) != value}
+            if not changed:
+                self.stats['unchanged'] += 1
+                continue
+            for field in changed:
+                setattr(coupon, field, values[field])
+            coupon.updated_at = now
+            fields.update(changed)
+            to_update.append(coupon)
+            if changed & SEARCH_FIELDS:
+                reindex.append(coupon.pk)
+
+        if self.dry_run:
+            self.stats['created'] += len(to_create)
+            self.stats['updated'] += len(to_update)
+            return
+
+        try:
+            with transaction.atomic():
+                Coupon.objects.bulk_create(to_create)
+                if to_update:
+                    Coupon.objects.bulk_update(to_update, sorted(fields))
+        except DatabaseError:
+            to_create, to_update = self._write_each(to_create, to_update, sorted(fields), lines)
+            written = {coupon.pk for coupon in to_update}
+            reindex = [pk for pk in reindex if pk in written]
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+        created_ids = [coupon.pk for coupon in to_create]
+        if None in created_ids:
+            # Backends without RETURNING on bulk inserts
+            created_ids = list(Coupon.objects.filter(
+                store_id__in={c.store_id for c in to_create}, code__in={c.code for c in to_create}
+            ).values_list('id', flat=True))
+        self.touched_ids.extend(created_ids)
+        self.touched_ids.extend(coupon.pk for coupon in to_update)
+        search.index_coupons(created_ids + reindex)
+
+    def run(self, rows):
+        batch = []
+        for line, row in rows:
+            batch.append((line, row))
+            self.stats['rows'] += 1
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+                if self.progress:
+                    self.progress(self.stats)
+        if batch:
+            self._write_batch(batch)
+            if self.progress:
+                self.progress(self.stats)
+
+        if self.touched_ids:
+            typeahead.changed('coupon', self.touched_ids)
+            bump_catalog_version('coupon')
+        return self.stats
+
+
+def import_coupons(fileobj, fmt, dry_run=False, batch_size=BATCH_SIZE, progress=None):
+    """Import a feed file. Returns the stats dict (rows/created/updated/unchanged/skipped/errors)."""
+    importer = CouponImporter(dry_run=dry_run, batch_size=batch_size, progress=progress)
+    return importer.run(read_rows(fileobj, fmt))
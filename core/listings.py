@@ -0,0 +1,39 @@
+from django.db.models import Count, Q
+
+from .models import Coupon
+
+
+# Long text columns the listing templates never read
+LISTING_DEFERRED_FIELDS = (
+    'description', 'description_en',
+    'store__description', 'store__description_en',
+)
+
+
+def coupon_listing(queryset=None):
+    """
+    Coupons ready for coupon_card.html: store and category joined in the
+    same query and unused TextFields deferred, so a page of N cards costs a
+    constant number of queries.
+    """
+    if queryset is None:
+        queryset = Coupon.objects.all()
+    return queryset.select_related('store', 'category').defer(*LISTING_DEFERRED_FIELDS)
+
+
+def active_coupons():
+    return coupon_listing().filter(is_active=True)
+
+
+def with_active_coupons_count(queryset):
+    """
+    Annotate a Store or Category queryset with ``num_active_coupons`` so
+    ``active_coupons_count`` is read from one grouped query instead of a
+    COUNT per row.
+    """
+    if not queryset.query.order_by:
+        # Meta.ordering is dropped from GROUP BY queries, so keep it explicit
+        queryset = queryset.order_by(*queryset.model._meta.ordering)
+    return queryset.annotate(
+        num_active_coupons=Count('coupons', filter=Q(coupons__is_active=True))
+    )
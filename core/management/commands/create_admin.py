@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import AppSettings
+from core.views_setup import reset_setup_state
 
 
 class Command(BaseCommand):
@@ -14,6 +15,7 @@ class Command(BaseCommand):
                 email='admin@coupons.com',
                 password='Admin@123456'
             )
+            reset_setup_state()
             self.stdout.write(self.style.SUCCESS('✅ Admin user created!'))
             self.stdout.write('Username: admin')
             self.stdout.write('Password: Admin@123456')
@@ -0,0 +1,44 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from core.exports import FORMATS, export_lines, usage_queryset
+from core.models import CouponUsage
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Stream coupon usage logs to CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--start', help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--store', help='Store slug')
+        parser.add_argument('--action', choices=[choice for choice, _ in CouponUsage.ACTION_CHOICES])
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        queryset = usage_queryset(
+            start=_date(options['start']) if options['start'] else None,
+            end=_date(options['end']) if options['end'] else None,
+            store=options['store'],
+            action=options['action'],
+        )
+
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in export_lines(queryset, options['format']):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"✅ Exported to {options['output']}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from core.images import IMAGE_FIELDS, variants
+from core.models import Category, Coupon, Notification, SliderItem, Store
+
+
+class Command(BaseCommand):
+    help = 'Create the resized/WebP derivatives of every uploaded image (new uploads get them on save)'
+
+    def handle(self, *args, **kwargs):
+        count = 0
+        for model in (Store, Category, Coupon, SliderItem, Notification):
+            fields = IMAGE_FIELDS[model._meta.model_name]
+            for instance in model.objects.only('id', *fields).iterator():
+                for field, preset in fields.items():
+                    field_file = getattr(instance, field)
+                    if field_file and variants(field_file, preset):
+                        count += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ Derivatives ready for {count} images'))
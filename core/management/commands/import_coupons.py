@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.imports import BATCH_SIZE, detect_format, import_coupons
+
+
+class Command(BaseCommand):
+    help = 'Import/upsert coupons from a CSV, JSON lines or JSON feed (matched on store + code)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file (.csv, .jsonl or .json)')
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'json'], help='Override the format detected from the file name')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without writing anything')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or detect_format(options['path'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        started = time.monotonic()
+
+        def progress(stats):
+            self.stdout.write(
+                f"  {stats['rows']} rows ({stats['created']} new, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged, {stats['skipped']} skipped)"
+            )
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                stats = import_coupons(fh, fmt, dry_run=options['dry_run'],
+                                       batch_size=options['batch_size'], progress=progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Import failed: {exc}')
+
+        for line, message in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'⚠️  line {line}: {message}'))
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix}{stats['created']} created, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['skipped']} skipped in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,90 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.listings import active_coupons, with_active_coupons_count
+from core.models import (
+    Category, Store, SliderItem, Favorite, Notification,
+    UserNotification, CouponUsage, SearchTerm, UsageRollup
+)
+
+# Lookup tables that stay small enough for a full scan to be the right plan
+SMALL_TABLES = {'core_slideritem', 'core_category', 'core_appsettings'}
+
+SEQ_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)\s*$'),  # SQLite
+    re.compile(r'Seq Scan on (\w+)'),  # PostgreSQL
+]
+
+
+def hot_querysets():
+    """The querysets behind each view, with placeholder ids."""
+    since = timezone.now() - timedelta(days=30)
+    return {
+        'index.slider': SliderItem.objects.filter(is_active=True)[:5],
+        'index.best_coupons': active_coupons().filter(is_best_offer=True)[:8],
+        'index.most_used_coupons': active_coupons().filter(is_most_used=True)[:8],
+        'index.latest_coupons': active_coupons().order_by('-created_at')[:8],
+        'index.featured_stores': with_active_coupons_count(Store.objects.filter(is_active=True, is_featured=True))[:8],
+        'index.categories': with_active_coupons_count(Category.objects.filter(is_active=True))[:8],
+        'stores': with_active_coupons_count(Store.objects.filter(is_active=True))[:16],
+        'store_detail.coupons': active_coupons().filter(store_id=1),
+        'coupons': active_coupons()[:12],
+        'coupons.by_store': active_coupons().filter(store__slug='x')[:12],
+        'category_coupons': active_coupons().filter(category_id=1)[:12],
+        'search.terms': SearchTerm.objects.filter(kind='coupon', term='x'),
+        'favorites': Favorite.objects.filter(user_id=1).select_related('coupon', 'coupon__store'),
+        'favorites.ids': Favorite.objects.filter(user_id=1).values_list('coupon_id', flat=True),
+        'notifications.pending': Notification.objects.filter(is_sent=True, send_to_all=True, sent_at__gt=since),
+        'notifications.list': UserNotification.objects.filter(user_id=1).order_by('-created_at')[:20],
+        'notifications.unread': UserNotification.objects.filter(user_id=1, is_read=False),
+        'usage.by_coupon': CouponUsage.objects.filter(coupon_id=1, created_at__gte=since),
+        'usage.by_date': CouponUsage.objects.filter(created_at__gte=since),
+        'rollups.by_day': UsageRollup.objects.filter(day__gte=since.date()),
+        'rollups.by_store': UsageRollup.objects.filter(store_id=1, day__gte=since.date()),
+    }
+
+
+def sequential_scans(plan):
+    tables = []
+    for line in plan.splitlines():
+        for pattern in SEQ_SCAN_PATTERNS:
+            match = pattern.search(line.strip())
+            if match:
+                tables.append(match.group(1))
+    return tables
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot view querysets and flag sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if any scan is flagged (for CI)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Backend: {connection.vendor}\n')
+        flagged = []
+
+        for name, queryset in hot_querysets().items():
+            plan = queryset.explain()
+            scans = [table for table in sequential_scans(plan) if table not in SMALL_TABLES]
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f'⚠️  {name}: sequential scan on {", ".join(scans)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {name}'))
+            if options['verbose_plans'] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f'      {line}')
+
+        if flagged:
+            message = f'{len(flagged)} queries use sequential scans'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f'\n{message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ All hot queries use indexes'))
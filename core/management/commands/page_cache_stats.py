@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core import pagecache, views  # noqa: F401 (importing views registers the cached pages)
+
+
+class Command(BaseCommand):
+    help = 'Show the anonymous page cache hit ratio per view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        if not pagecache.RECORD_STATS:
+            self.stdout.write(self.style.WARNING('⚠️  PAGE_CACHE_STATS is off, nothing is being counted'))
+        for name, counts in pagecache.stats().items():
+            self.stdout.write(
+                f"{name:<20} {counts['ratio']:6.1%}  hits={counts['hits']} "
+                f"misses={counts['misses']} bypassed={counts['bypassed']}"
+            )
+        if options['reset']:
+            pagecache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('✅ Page cache counters reset'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the coupon/store search index from scratch'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding search index...')
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✅ Indexed {count} terms'))
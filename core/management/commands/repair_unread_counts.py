@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.notifications import recount_unread
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user unread notification counters from scratch'
+
+    def handle(self, *args, **kwargs):
+        fixed = recount_unread()
+        self.stdout.write(self.style.SUCCESS(f'✅ Repaired {fixed} unread counters'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from core.models import *
+from core.views_setup import reset_setup_state
 import os
 import shutil
 from django.conf import settings
@@ -26,6 +27,7 @@ class Command(BaseCommand):
         
         # Delete users
         User.objects.all().delete()
+        reset_setup_state()
         self.stdout.write('   Deleted all users')
         
         # Clean media folders
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = 'Update the daily coupon usage rollups (safe to re-run; run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every day instead of only the new ones')
+        parser.add_argument('--since', help='With --rebuild, first day to recompute (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            since = None
+            if options['since']:
+                try:
+                    since = date.fromisoformat(options['since'])
+                except ValueError:
+                    raise CommandError('--since must be a date (YYYY-MM-DD)')
+            self.stdout.write('Rebuilding usage rollups...')
+            days = rollups.rebuild(since)
+        else:
+            days = rollups.update()
+        self.stdout.write(self.style.SUCCESS(f'✅ Rolled up {len(days)} days'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core import trending
+
+
+class Command(BaseCommand):
+    help = 'Fold new coupon usage into the trending scores (run every few minutes from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop all scores and replay the whole usage log')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write('Rebuilding trending scores...')
+            count = trending.rebuild()
+        else:
+            count = trending.update()
+        self.stdout.write(self.style.SUCCESS(f'✅ Consumed {count} usage events'))
@@ -0,0 +1,149 @@
+"""
+Serving of user-uploaded media.
+
+URLs built by ``core.storage.MediaStorage`` carry a content hash
+(``/media/stores/x.png?v=<hash>``), so a request with the current hash is
+answered with a one-year ``immutable`` Cache-Control and browsers never ask
+again. Everything else gets ETag/Last-Modified revalidation (304s) and
+single byte-range support.
+
+When a front proxy is configured the file body is handed off to it
+(``X-Accel-Redirect`` for nginx, ``X-Sendfile`` for Apache/lighttpd);
+otherwise ``FileResponse`` lets the WSGI server use ``sendfile()``.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+ACCEL_REDIRECT = getattr(settings, 'MEDIA_ACCEL_REDIRECT', '')
+SENDFILE_HEADER = getattr(settings, 'MEDIA_SENDFILE_HEADER', '')
+MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# path -> (mtime_ns, size, hash); only re-hashed when the file changes
+_hashes = {}
+_lock = threading.Lock()
+
+
+def file_hash(path):
+    """Short content hash of ``path`` (None if missing), memoized per mtime/size."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    entry = _hashes.get(path)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[2]
+
+    digest = hashlib.md5()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()[:12]
+    with _lock:
+        _hashes[path] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def _byte_range(header, size):
+    """(start, end) inclusive for a single-range header, 'invalid', or None to send it all."""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _read_range(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def _cache_headers(request, response, etag, stat):
+    # Sent on 304s too, so caches refresh their stored validators and lifetime
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if request.GET.get('v') and quote_etag(request.GET['v']) == etag:
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+    return response
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    etag = quote_etag(file_hash(full_path))
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _cache_headers(request, not_modified, etag, stat)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        # Percent-encoded: a non-ASCII header value would go out RFC 2047 encoded
+        response['X-Accel-Redirect'] = quote(ACCEL_REDIRECT.rstrip('/') + '/' + path.lstrip('/'))
+    elif SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        response[SENDFILE_HEADER] = quote(full_path)
+    else:
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', etag) == etag:
+            byte_range = _byte_range(request.META['HTTP_RANGE'], stat.st_size)
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(open(full_path, 'rb'), start, end - start + 1),
+                status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return _cache_headers(request, response, etag, stat)
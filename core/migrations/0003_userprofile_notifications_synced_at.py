@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_couponusage_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='notifications_synced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='آخر مزامنة للإشعارات'),
+        ),
+    ]
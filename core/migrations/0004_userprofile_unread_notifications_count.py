@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counts(apps, schema_editor):
+    UserNotification = apps.get_model('core', 'UserNotification')
+    UserProfile = apps.get_model('core', 'UserProfile')
+    counts = (
+        UserNotification.objects.filter(is_read=False)
+        .values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+    for user_id, n in counts:
+        UserProfile.objects.filter(user_id=user_id).update(unread_notifications_count=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_userprofile_notifications_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='الإشعارات غير المقروءة'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
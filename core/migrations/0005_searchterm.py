@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_userprofile_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('coupon', 'كوبون'), ('store', 'متجر')], max_length=10, verbose_name='النوع')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='المعرف')),
+                ('term', models.CharField(max_length=64, verbose_name='الكلمة')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='الوزن')),
+            ],
+            options={
+                'verbose_name': 'كلمة بحث',
+                'verbose_name_plural': 'فهرس البحث',
+                'indexes': [models.Index(fields=['kind', 'term'], name='searchterm_kind_term'), models.Index(fields=['kind', 'object_id'], name='searchterm_kind_object')],
+            },
+        ),
+    ]
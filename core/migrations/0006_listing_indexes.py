@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-is_best_offer', '-is_most_used', '-created_at'], name='coupon_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='coupon_latest'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_best_offer', True)), fields=['-is_most_used', '-created_at'], name='coupon_best_offer'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_most_used', True)), fields=['-created_at'], name='coupon_most_used'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['store', 'is_active'], name='coupon_store_active'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['category', 'is_active'], name='coupon_category_active'),
+        ),
+        migrations.AddIndex(
+            model_name='couponusage',
+            index=models.Index(fields=['coupon', 'created_at'], name='usage_coupon_created'),
+        ),
+        migrations.AddIndex(
+            model_name='couponusage',
+            index=models.Index(fields=['created_at'], name='usage_created'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_sent', True), ('send_to_all', True)), fields=['sent_at'], name='notification_broadcast'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(fields=['is_active', 'is_featured', 'order'], name='store_active_featured'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-is_featured', 'name'], name='store_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', 'is_read'], name='usernotif_user_read'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', '-created_at'], name='usernotif_user_created'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='الاسم')),
+                ('last_id', models.PositiveBigIntegerField(default=0, verbose_name='آخر معرف')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'علامة تقدم',
+                'verbose_name_plural': 'علامات التقدم',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('coupon', 'كوبون'), ('store', 'متجر')], max_length=10, verbose_name='النوع')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='المعرف')),
+                ('score', models.FloatField(default=0, verbose_name='النقاط')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'ترتيب رائج',
+                'verbose_name_plural': 'الترتيب الرائج',
+                'indexes': [models.Index(fields=['kind', '-score'], name='trending_kind_score')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trendingscore',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='trending_kind_object'),
+        ),
+    ]
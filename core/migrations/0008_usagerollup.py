@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='اليوم')),
+                ('action', models.CharField(choices=[('view', 'مشاهدة'), ('copy', 'نسخ'), ('click', 'نقر')], max_length=20, verbose_name='الإجراء')),
+                ('device_type', models.CharField(blank=True, max_length=20, verbose_name='نوع الجهاز')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='العدد')),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to='core.coupon', verbose_name='الكوبون')),
+                ('store', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to='core.store', verbose_name='المتجر')),
+            ],
+            options={
+                'verbose_name': 'ملخص استخدام يومي',
+                'verbose_name_plural': 'ملخصات الاستخدام اليومية',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['store', 'day'], name='rollup_store_day')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usagerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'coupon', 'action', 'device_type'), name='rollup_day_coupon_action_device'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_usagerollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['store', 'code'], name='coupon_store_code'),
+        ),
+    ]
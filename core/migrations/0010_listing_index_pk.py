@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_coupon_store_code'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='coupon',
+            name='coupon_listing',
+        ),
+        migrations.RemoveIndex(
+            model_name='store',
+            name='store_listing',
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-is_best_offer', '-is_most_used', '-created_at', '-id'], name='coupon_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order', '-is_featured', 'name', 'id'], name='store_listing'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_listing_index_pk'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchterm',
+            name='searchterm_kind_term',
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['kind', 'term'], name='searchterm_kind_term', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 
@@ -30,6 +30,9 @@ class Category(models.Model):
 
     @property
     def active_coupons_count(self):
+        # Listings annotate this via core.listings.with_active_coupons_count()
+        if getattr(self, 'num_active_coupons', None) is not None:
+            return self.num_active_coupons
         return self.coupons.filter(is_active=True).count()
 
 
@@ -53,10 +56,21 @@ class Store(models.Model):
         verbose_name = 'متجر'
         verbose_name_plural = 'المتاجر'
         ordering = ['order', '-is_featured', 'name']
+        indexes = [
+            models.Index(fields=['is_active', 'is_featured', 'order'], name='store_active_featured'),
+            models.Index(fields=['order', '-is_featured', 'name', 'id'], name='store_listing', condition=models.Q(is_active=True)),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Names as loaded, so a save can tell whether coupon search documents changed
+        instance._loaded_names = (instance.__dict__.get('name'), instance.__dict__.get('name_en'))
+        return instance
+
     def get_name(self, lang='ar'):
         if lang == 'en' and self.name_en:
             return self.name_en
@@ -69,6 +83,9 @@ class Store(models.Model):
 
     @property
     def active_coupons_count(self):
+        # Listings annotate this via core.listings.with_active_coupons_count()
+        if getattr(self, 'num_active_coupons', None) is not None:
+            return self.num_active_coupons
         return self.coupons.filter(is_active=True).count()
 
 
@@ -99,6 +116,18 @@ class Coupon(models.Model):
         verbose_name = 'كوبون'
         verbose_name_plural = 'الكوبونات'
         ordering = ['-is_best_offer', '-is_most_used', '-created_at']
+        indexes = [
+            # Default listing order of active coupons (coupons, category, store pages)
+            models.Index(fields=['-is_best_offer', '-is_most_used', '-created_at', '-id'], name='coupon_listing', condition=models.Q(is_active=True)),
+            models.Index(fields=['-created_at'], name='coupon_latest', condition=models.Q(is_active=True)),
+            # Homepage sections
+            models.Index(fields=['-is_most_used', '-created_at'], name='coupon_best_offer', condition=models.Q(is_active=True, is_best_offer=True)),
+            models.Index(fields=['-created_at'], name='coupon_most_used', condition=models.Q(is_active=True, is_most_used=True)),
+            models.Index(fields=['store', 'is_active'], name='coupon_store_active'),
+            models.Index(fields=['category', 'is_active'], name='coupon_category_active'),
+            # Upsert key of core.imports
+            models.Index(fields=['store', 'code'], name='coupon_store_code'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.store.name}"
@@ -203,6 +232,9 @@ class Notification(models.Model):
         verbose_name = 'إشعار'
         verbose_name_plural = 'الإشعارات'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sent_at'], name='notification_broadcast', condition=models.Q(is_sent=True, send_to_all=True)),
+        ]
 
     def __str__(self):
         return self.title
@@ -230,6 +262,10 @@ class UserNotification(models.Model):
         verbose_name_plural = 'إشعارات المستخدمين'
         unique_together = ('user', 'notification')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='usernotif_user_read'),
+            models.Index(fields=['user', '-created_at'], name='usernotif_user_created'),
+        ]
 
 
 class AppSettings(models.Model):
@@ -302,12 +338,139 @@ class AppSettings(models.Model):
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
 
+    @classmethod
+    def get_cached(cls):
+        """Same as get_settings() but served from process memory."""
+        from .cache import get_app_settings
+        return get_app_settings()
+
     def get_app_name(self, lang='ar'):
         if lang == 'en' and self.app_name_en:
             return self.app_name_en
         return self.app_name
 
 
+class SearchTerm(models.Model):
+    """Inverted index row used by core.search (one term of one coupon/store)."""
+    KIND_CHOICES = [
+        ('coupon', 'كوبون'),
+        ('store', 'متجر'),
+    ]
+
+    kind = models.CharField('النوع', max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField('المعرف')
+    term = models.CharField('الكلمة', max_length=64)
+    weight = models.PositiveSmallIntegerField('الوزن', default=1)
+
+    class Meta:
+        verbose_name = 'كلمة بحث'
+        verbose_name_plural = 'فهرس البحث'
+        indexes = [
+            # pattern_ops (PostgreSQL) so prefix LIKEs use it under any collation;
+            # the opclasses are ignored on other backends
+            models.Index(
+                fields=['kind', 'term'], name='searchterm_kind_term',
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+            ),
+            models.Index(fields=['kind', 'object_id'], name='searchterm_kind_object'),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+@receiver(post_save, sender=Coupon)
+def index_coupon(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from . import typeahead
+    from .search import index_coupons
+    index_coupons([instance.pk])
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.changed('coupon', [pk]))
+
+
+@receiver(post_save, sender=Store)
+def index_store(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from . import typeahead
+    from .search import index_coupons, index_stores
+    index_stores([instance.pk])
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.changed('store', [pk]))
+
+    # Coupons carry the store name in their search document
+    names = (instance.name, instance.name_en)
+    if getattr(instance, '_loaded_names', None) == names:
+        return
+    instance._loaded_names = names
+    coupon_ids = list(instance.coupons.values_list('id', flat=True))
+    index_coupons(coupon_ids)
+    transaction.on_commit(lambda: typeahead.changed('coupon', coupon_ids))
+
+
+@receiver(post_delete, sender=Coupon)
+def unindex_coupon(sender, instance, **kwargs):
+    from . import typeahead
+    from .search import remove
+    remove('coupon', [instance.pk])
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.changed('coupon', [pk]))
+
+
+@receiver(post_delete, sender=Store)
+def unindex_store(sender, instance, **kwargs):
+    from . import typeahead
+    from .search import remove
+    remove('store', [instance.pk])
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.changed('store', [pk]))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Store)
+@receiver([post_save, post_delete], sender=Coupon)
+@receiver([post_save, post_delete], sender=SliderItem)
+def bump_catalog_version(sender, **kwargs):
+    from .cache import bump_catalog_version
+    # After commit, or a worker re-reading in between would cache the old rows under the new version
+    model_name = sender._meta.model_name
+    transaction.on_commit(lambda: bump_catalog_version(model_name))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Store)
+@receiver(post_save, sender=Coupon)
+@receiver(post_save, sender=SliderItem)
+@receiver(post_save, sender=Notification)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .images import generate_for
+    transaction.on_commit(lambda: generate_for(instance))
+
+
+@receiver(post_save, sender=Favorite)
+def cache_favorite_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .favorites import favorite_added
+        favorite_added(instance.user_id, instance.coupon_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def cache_favorite_removed(sender, instance, **kwargs):
+    from .favorites import favorite_removed
+    favorite_removed(instance.user_id, instance.coupon_id)
+
+
+@receiver(post_save, sender=AppSettings)
+@receiver(post_delete, sender=AppSettings)
+def invalidate_app_settings_cache(sender, **kwargs):
+    from .cache import invalidate_app_settings
+    transaction.on_commit(invalidate_app_settings)
+
+
 class CouponUsage(models.Model):
     ACTION_CHOICES = [
         ('view', 'مشاهدة'),
@@ -321,17 +484,87 @@ class CouponUsage(models.Model):
     ip_address = models.GenericIPAddressField('عنوان IP', null=True, blank=True)
     user_agent = models.TextField('معلومات المتصفح', blank=True)
     device_type = models.CharField('نوع الجهاز', max_length=20, blank=True)
-    created_at = models.DateTimeField('التاريخ', auto_now_add=True)
+    # Set when the event is queued, not when the batch is written
+    created_at = models.DateTimeField('التاريخ', default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = 'سجل استخدام'
         verbose_name_plural = 'سجلات الاستخدام'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['coupon', 'created_at'], name='usage_coupon_created'),
+            models.Index(fields=['created_at'], name='usage_created'),
+        ]
 
     def __str__(self):
         return f"{self.coupon.code} - {self.action}"
 
 
+class Watermark(models.Model):
+    """Last CouponUsage id consumed by an incremental job (core.trending, ...)."""
+    name = models.CharField('الاسم', max_length=50, unique=True)
+    last_id = models.PositiveBigIntegerField('آخر معرف', default=0)
+    updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
+
+    class Meta:
+        verbose_name = 'علامة تقدم'
+        verbose_name_plural = 'علامات التقدم'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+class TrendingScore(models.Model):
+    """
+    Time-decayed popularity of a coupon or store, maintained by core.trending.
+    ``score`` is log2 of the decayed usage weight referred to a fixed epoch,
+    so rows never need re-decaying and ordering by it ranks by current score.
+    """
+    KIND_CHOICES = SearchTerm.KIND_CHOICES
+
+    kind = models.CharField('النوع', max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField('المعرف')
+    score = models.FloatField('النقاط', default=0)
+    updated_at = models.DateTimeField('تاريخ التحديث', auto_now=True)
+
+    class Meta:
+        verbose_name = 'ترتيب رائج'
+        verbose_name_plural = 'الترتيب الرائج'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='trending_kind_object'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-score'], name='trending_kind_score'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.score:.2f}"
+
+
+class UsageRollup(models.Model):
+    """Per-day CouponUsage counts, maintained by core.rollups."""
+    day = models.DateField('اليوم')
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='usage_rollups', verbose_name='الكوبون')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='usage_rollups', verbose_name='المتجر', db_index=False)
+    action = models.CharField('الإجراء', max_length=20, choices=CouponUsage.ACTION_CHOICES)
+    device_type = models.CharField('نوع الجهاز', max_length=20, blank=True)
+    count = models.PositiveIntegerField('العدد', default=0)
+
+    class Meta:
+        verbose_name = 'ملخص استخدام يومي'
+        verbose_name_plural = 'ملخصات الاستخدام اليومية'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'coupon', 'action', 'device_type'], name='rollup_day_coupon_action_device'),
+        ]
+        indexes = [
+            models.Index(fields=['store', 'day'], name='rollup_store_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.coupon_id} {self.action}: {self.count}"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name='المستخدم')
     phone = models.CharField('رقم الهاتف', max_length=20, blank=True)
@@ -341,6 +574,8 @@ class UserProfile(models.Model):
     receive_emails = models.BooleanField('استلام البريد', default=True)
     is_banned = models.BooleanField('محظور', default=False)
     ban_reason = models.TextField('سبب الحظر', blank=True)
+    notifications_synced_at = models.DateTimeField('آخر مزامنة للإشعارات', null=True, blank=True, editable=False)
+    unread_notifications_count = models.PositiveIntegerField('الإشعارات غير المقروءة', default=0, editable=False)
     created_at = models.DateTimeField('تاريخ التسجيل', auto_now_add=True)
     updated_at = models.DateTimeField('آخر تحديث', auto_now=True)
 
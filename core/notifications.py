@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Notification, UserNotification, UserProfile
+
+
+def materialize_notifications(user):
+    """
+    Create the UserNotification rows for broadcasts sent since the user's
+    last visit. Uses a per-user sent_at watermark so each visit costs one
+    query when there is nothing new, instead of one per notification.
+    """
+    profile, created = UserProfile.objects.get_or_create(user=user)
+
+    pending = Notification.objects.filter(is_sent=True, send_to_all=True)
+    if profile.notifications_synced_at is not None:
+        pending = pending.filter(sent_at__gt=profile.notifications_synced_at)
+
+    batch = list(pending.values_list('id', 'sent_at'))
+    if not batch:
+        return 0
+
+    ids = [notification_id for notification_id, _ in batch]
+    existing = set(UserNotification.objects.filter(
+        user=user, notification_id__in=ids
+    ).values_list('notification_id', flat=True))
+    new_ids = [notification_id for notification_id in ids if notification_id not in existing]
+
+    updates = {}
+    watermark = max((sent_at for _, sent_at in batch if sent_at), default=None)
+    if watermark is not None:
+        updates['notifications_synced_at'] = watermark
+
+    with transaction.atomic():
+        UserNotification.objects.bulk_create(
+            [UserNotification(user=user, notification_id=notification_id) for notification_id in new_ids],
+            ignore_conflicts=True,
+        )
+        if new_ids:
+            # A concurrent visit may have inserted some of new_ids since the diff
+            # (ignore_conflicts skips them), so count the rows rather than add
+            updates['unread_notifications_count'] = UserNotification.objects.filter(
+                user=user, is_read=False
+            ).count()
+        if updates:
+            UserProfile.objects.filter(pk=profile.pk).update(**updates)
+    return len(new_ids)
+
+
+def get_unread_count(user):
+    """Unread notifications for ``user`` from the denormalized counter."""
+    try:
+        return user.profile.unread_notifications_count
+    except UserProfile.DoesNotExist:
+        return 0
+
+
+async def aget_unread_count(user):
+    """Async ``get_unread_count`` for the ASGI endpoints."""
+    count = await UserProfile.objects.filter(user=user).values_list(
+        'unread_notifications_count', flat=True
+    ).afirst()
+    return count or 0
+
+
+def mark_read(user_notification):
+    """Mark one notification read and keep the user's counter in step."""
+    with transaction.atomic():
+        updated = UserNotification.objects.filter(
+            pk=user_notification.pk, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        if updated:
+            UserProfile.objects.filter(
+                user_id=user_notification.user_id, unread_notifications_count__gt=0
+            ).update(unread_notifications_count=F('unread_notifications_count') - 1)
+    return bool(updated)
+
+
+def recount_unread():
+    """Recompute every unread counter from UserNotification. Returns profiles fixed."""
+    actual = dict(
+        UserNotification.objects.filter(is_read=False)
+        .values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+
+    stale = []
+    for profile in UserProfile.objects.only('id', 'user_id', 'unread_notifications_count').iterator():
+        count = actual.get(profile.user_id, 0)
+        if count != profile.unread_notifications_count:
+            profile.unread_notifications_count = count
+            stale.append(profile)
+
+    UserProfile.objects.bulk_update(stale, ['unread_notifications_count'], batch_size=500)
+    return len(stale)
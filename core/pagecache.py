@@ -0,0 +1,109 @@
+"""
+Full-page cache for anonymous visitors.
+
+A cached page is keyed on the path, the query parameters the view actually
+reads (blank ones dropped, sorted), the session language and the version
+counters the page depends on, so a catalog/settings change simply moves
+readers to new keys. Logged-in users and requests carrying flash messages
+always get a fresh render, and so does any response that shows a message.
+
+Pages are stored as their rendered bytes; the CSRF cookie is still issued
+on a hit because the templates read the token from the cookie rather than
+embedding it. With ``PAGE_CACHE_STATS`` on, hits, misses and bypasses are
+counted per view for ``stats()`` (``manage.py page_cache_stats``).
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .cache import CATALOG_MODELS, get_versions
+from .conditional import has_pending_messages
+
+TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+RECORD_STATS = getattr(settings, 'PAGE_CACHE_STATS', False)
+OUTCOMES = ('hits', 'misses', 'bypassed')
+
+# Names of the cached views, for stats()
+PAGES = []
+
+
+def _stats_key(name, outcome):
+    return f'core:pagecache:{name}:{outcome}'
+
+
+def _record(name, outcome):
+    if not RECORD_STATS:
+        return
+    key = _stats_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def page_key(request, name, params, versions):
+    query = sorted((param, value) for param in params for value in request.GET.getlist(param) if value)
+    parts = [request.path, urlencode(query), request.session.get('language')]
+    parts += [versions[version] for version in sorted(versions)]
+    return f'core:page:{name}:' + hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def cached_page(view=None, params=(), versions=()):
+    """
+    Cache an anonymous GET view. ``params`` are the query parameters the view
+    reads; ``versions`` names counters it depends on besides the catalog
+    and app settings (e.g. ``'trending'``).
+    """
+    def decorator(view):
+        name = view.__name__
+        PAGES.append(name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated or has_pending_messages(request):
+                _record(name, 'bypassed')
+                return view(request, *args, **kwargs)
+
+            current = get_versions(*[f'catalog.{model}' for model in CATALOG_MODELS], 'app_settings', *versions)
+            key = page_key(request, name, params, current)
+            entry = cache.get(key)
+            if entry is not None:
+                _record(name, 'hits')
+                if 'CSRF_COOKIE' not in request.META:
+                    get_token(request)
+                content, content_type = entry
+                return HttpResponse(content, content_type=content_type)
+
+            _record(name, 'misses')
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming and not response.cookies
+                    and not has_pending_messages(request)):
+                cache.set(key, (response.content, response['Content-Type']), TIMEOUT)
+            return response
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+def stats():
+    """``{view: {'hits', 'misses', 'bypassed', 'ratio'}}`` since the last reset."""
+    keys = [_stats_key(name, outcome) for name in PAGES for outcome in OUTCOMES]
+    found = cache.get_many(keys)
+    result = {}
+    for name in PAGES:
+        counts = {outcome: found.get(_stats_key(name, outcome), 0) for outcome in OUTCOMES}
+        served = counts['hits'] + counts['misses']
+        counts['ratio'] = counts['hits'] / served if served else 0.0
+        result[name] = counts
+    return result
+
+
+def reset_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in PAGES for outcome in OUTCOMES])
@@ -0,0 +1,168 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the ordering values of the last/first row shown
+instead of an OFFSET, so page 500 costs the same as page 1. Cursors are
+opaque URL-safe tokens; ordering columns must be non-null local fields or
+annotations, and the primary key is appended as a tie-breaker.
+
+The total is only counted when ``paginator.count`` is read, and then it is
+kept in the shared cache under ``count_version``.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+COUNT_CACHE_TIMEOUT = 600
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, paginator):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, count_version=None, values=None):
+        """``values``: project rows to dicts with ``values(*values)`` (ordering fields are added)."""
+        self.per_page = per_page
+        self.count_version = count_version
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        self.ordering = ordering
+        if values is not None:
+            queryset = queryset.values(*dict.fromkeys([*values, *(name.lstrip('-') for name in ordering)]))
+        self.queryset = queryset
+
+    @cached_property
+    def count(self):
+        if self.count_version is None:
+            return self.queryset.count()
+        try:
+            sql, params = self.queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        key = f'core:count:{digest}:{self.count_version}'
+        count = cache.get(key)
+        if count is None:
+            count = self.queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    # ==================== Cursors ====================
+    def _field(self, name):
+        name = name.lstrip('-')
+        if name == 'pk':
+            return self.queryset.model._meta.pk
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None  # annotation
+
+    def _values(self, obj):
+        values = []
+        for name in self.ordering:
+            # Rows of a values() queryset must include the ordering fields
+            value = obj[name.lstrip('-')] if isinstance(obj, dict) else getattr(obj, name.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def encode_cursor(self, obj, direction):
+        payload = json.dumps({'d': direction, 'v': self._values(obj)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, raw = payload['d'], payload['v']
+            if direction not in ('n', 'p') or len(raw) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            values = []
+            for name, value in zip(self.ordering, raw):
+                field = self._field(name)
+                values.append(field.to_python(value) if field is not None else value)
+            return direction, values
+        except (ValueError, KeyError, TypeError, ValidationError) as exc:
+            raise InvalidCursor(cursor) from exc
+
+    # ==================== Querying ====================
+    def _after(self, values, reverse=False):
+        """Rows strictly after ``values`` in ordering (or before, if reverse)."""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            lookup = f"{name.lstrip('-')}__{'lt' if descending else 'gt'}"
+            term = Q(**{lookup: values[i]})
+            for prev_name, prev_value in zip(self.ordering[:i], values[:i]):
+                term &= Q(**{prev_name.lstrip('-'): prev_value})
+            condition |= term
+        # The OR alone gives the database no place to start in the index; a
+        # bound on the leading column lets it seek straight to the cursor
+        first = self.ordering[0]
+        descending = first.startswith('-') != reverse
+        leading = Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]})
+        return leading & condition
+
+    def get_page(self, cursor=None):
+        """Page after/before ``cursor``; an invalid or missing cursor gives the first page."""
+        direction, values = 'n', None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = 'n', None
+
+        queryset = self.queryset
+        if direction == 'p':
+            reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = queryset.filter(self._after(values, reverse=True)).order_by(*reversed_ordering)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+            if values is not None:
+                queryset = queryset.filter(self._after(values))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'p') if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor, self)
@@ -0,0 +1,171 @@
+"""
+Inverted-index search for coupons and stores.
+
+Every active coupon/store is tokenized into SearchTerm rows (term, weight)
+after Arabic normalization, so a query is an indexed lookup on ``term``
+instead of a chain of ``icontains`` scans. Results are ranked by the summed
+field weights of the matched terms; every query word must match and the
+last one also matches as a prefix (for search-as-you-type).
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+
+from .models import Coupon, SearchTerm, Store
+
+MAX_RESULTS = 500
+MAX_TERM_LENGTH = 64
+
+TASHKEEL_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+TOKEN_RE = re.compile(r'\w+')
+
+ARABIC_CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+COUPON_FIELDS = {
+    'code': 4,
+    'title': 3,
+    'title_en': 3,
+    'store__name': 2,
+    'store__name_en': 2,
+    'description': 1,
+    'description_en': 1,
+}
+
+STORE_FIELDS = {
+    'name': 3,
+    'name_en': 3,
+    'description': 1,
+    'description_en': 1,
+}
+
+
+def normalize(text):
+    """Lowercase and fold Arabic spelling variants (hamza/alef, taa marbuta, tashkeel)."""
+    text = TASHKEEL_RE.sub('', text or '')
+    return text.translate(ARABIC_CHAR_MAP).lower()
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(normalize(text))]
+
+
+def variants(token):
+    """The token plus its form without the definite article ("المتجر" -> "متجر")."""
+    if token.startswith('ال') and len(token) > 4:
+        return [token, token[2:]]
+    return [token]
+
+
+# ==================== Indexing ====================
+def _document_terms(values, weights):
+    terms = {}
+    for field, weight in weights.items():
+        for token in tokenize(values.get(field)):
+            for term in variants(token):
+                terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def _index_rows(kind, queryset, weights):
+    fields = ['id', *weights]
+    for values in queryset.values(*fields).iterator():
+        for term, weight in _document_terms(values, weights).items():
+            yield SearchTerm(kind=kind, object_id=values['id'], term=term, weight=min(weight, 32767))
+
+
+def _reindex(kind, queryset, weights, ids):
+    with transaction.atomic():
+        SearchTerm.objects.filter(kind=kind, object_id__in=ids).delete()
+        SearchTerm.objects.bulk_create(
+            _index_rows(kind, queryset.filter(id__in=ids, is_active=True), weights),
+            batch_size=1000,
+        )
+
+
+def index_coupons(ids):
+    _reindex('coupon', Coupon.objects.all(), COUPON_FIELDS, list(ids))
+
+
+def index_stores(ids):
+    _reindex('store', Store.objects.all(), STORE_FIELDS, list(ids))
+
+
+def remove(kind, ids):
+    SearchTerm.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+def rebuild():
+    """Drop and rebuild the whole index. Returns the number of terms written."""
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        SearchTerm.objects.bulk_create(
+            _index_rows('coupon', Coupon.objects.filter(is_active=True), COUPON_FIELDS),
+            batch_size=1000,
+        )
+        SearchTerm.objects.bulk_create(
+            _index_rows('store', Store.objects.filter(is_active=True), STORE_FIELDS),
+            batch_size=1000,
+        )
+    return SearchTerm.objects.count()
+
+
+# ==================== Querying ====================
+def ranked_ids(kind, query, limit=MAX_RESULTS):
+    """Object ids matching every word of ``query``, best match first."""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return []
+
+    matchers = [Q(term__in=variants(token)) for token in tokens[:-1]]
+    last = Q()
+    for term in variants(tokens[-1]):
+        # LIKE 'x%' rather than a range, whose bound depends on the collation;
+        # the (kind, term) index is built with pattern_ops for it
+        last |= Q(term__startswith=term)
+    matchers.append(last)
+
+    any_match = Q()
+    for matcher in matchers:
+        any_match |= matcher
+
+    hits = {
+        f'hit_{i}': Max(Case(When(matcher, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, matcher in enumerate(matchers)
+    }
+    rows = (
+        SearchTerm.objects.filter(any_match, kind=kind)
+        .values('object_id')
+        .annotate(score=Sum('weight'), **hits)
+        .filter(**{name: 1 for name in hits})
+        .order_by('-score', 'object_id')
+        .values_list('object_id', flat=True)[:limit]
+    )
+    return list(rows)
+
+
+def order_by_rank(queryset, ids):
+    """
+    Filter ``queryset`` to ``ids`` and keep the ranking order. The position
+    is annotated as ``search_rank`` so results can be keyset-paginated.
+    """
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=Value(pos)) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+
+def search_coupons(queryset, query, limit=MAX_RESULTS):
+    return order_by_rank(queryset, ranked_ids('coupon', query, limit))
+
+
+def search_stores(queryset, query, limit=MAX_RESULTS):
+    return order_by_rank(queryset, ranked_ids('store', query, limit))
@@ -0,0 +1,14 @@
+from django.core.files.storage import FileSystemStorage
+
+from .media import file_hash
+
+
+class MediaStorage(FileSystemStorage):
+    """
+    FileSystemStorage whose URLs carry the file's content hash (``?v=``),
+    so core.media can serve them as immutable.
+    """
+    def url(self, name):
+        url = super().url(name)
+        version = file_hash(self.path(name)) if name else None
+        return f'{url}?v={version}' if version else url
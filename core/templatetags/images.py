@@ -0,0 +1,40 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from core.images import PRESETS, variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(image, preset='logo', alt='', css_class=None, style=None, sizes=None):
+    """
+    ``<picture>`` with WebP and JPEG/PNG ``srcset``s of the derivatives of
+    ``image`` (see core.images), falling back to the original file.
+    """
+    if not image:
+        return ''
+    attrs = {'alt': alt, 'class': css_class, 'style': style, 'loading': 'lazy', 'decoding': 'async'}
+    found = variants(image, preset)
+    if not found:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    sizes = sizes or PRESETS[preset]['sizes']
+    webp_srcset = ', '.join(f'{webp} {width}w' for width, webp, _ in found)
+    fallback_srcset = ', '.join(f'{url} {width}w' for width, _, url in found)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp_srcset, sizes, found[len(found) // 2][2], fallback_srcset, sizes, flatatt(attrs),
+    )
+
+
+@register.simple_tag
+def image_url(image, preset='cover', width=1280):
+    """URL of the fallback derivative closest to ``width`` (for CSS backgrounds)."""
+    if not image:
+        return ''
+    found = variants(image, preset)
+    if not found:
+        return image.url
+    return min(found, key=lambda variant: abs(variant[0] - int(width)))[2]
@@ -1,3 +1,914 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.cache import caches
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    analytics, counters, exports, favorites, images, imports, media, pagecache, rollups, trending, typeahead,
+    usage_queue,
+)
+from .models import (
+    Category, Coupon, CouponUsage, Favorite, Notification, Store, TrendingScore, UsageRollup, UserNotification,
+    UserProfile,
+)
+from .notifications import get_unread_count, mark_read, materialize_notifications, recount_unread
+from .pagination import KeysetPaginator
+from .search import normalize, search_coupons, search_stores, tokenize, variants
+
+
+# Views render {% static %}; the manifest storage needs collectstatic first
+plain_static = override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'versions')
+}
+
+
+@plain_static
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheTestCase(TestCase):
+    """Runs on empty in-memory caches, so nothing leaks between tests or runs."""
+    def setUp(self):
+        super().setUp()
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+
+
+def make_store(slug='noon', **kwargs):
+    kwargs.setdefault('name', slug)
+    return Store.objects.create(slug=slug, url='https://example.com', **kwargs)
+
+
+def send_notification(minutes_ago=0):
+    return Notification.objects.create(
+        title='إشعار', message='.', is_sent=True, send_to_all=True,
+        sent_at=timezone.now() - timedelta(minutes=minutes_ago),
+    )
+
+
+# ==================== Counters ====================
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.dict(counters._pending, clear=True),
+                        mock.patch.object(counters, '_ensure_flusher')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.store = make_store()
+        self.coupons = [Coupon.objects.create(store=self.store, title='خصم', code=f'C{i}') for i in range(3)]
+
+    def test_flush_applies_buffered_increments(self):
+        for coupon, times in zip(self.coupons, (2, 2, 1)):
+            for _ in range(times):
+                counters.increment(coupon, 'used_count')
+        counters.increment(self.store, 'click_count', 5)
+        self.assertEqual(counters.pending(self.coupons[0], 'used_count'), 2)
+
+        # One UPDATE per (model, field, delta) group, inside a savepoint
+        with self.assertNumQueries(3 + 2):
+            self.assertEqual(counters.flush(), 4)
+        self.assertEqual([c.used_count for c in Coupon.objects.order_by('pk')], [2, 2, 1])
+        self.assertEqual(Store.objects.get(pk=self.store.pk).click_count, 5)
+        self.assertEqual(counters.pending(self.coupons[0], 'used_count'), 0)
+
+    def test_only_registered_fields_are_buffered(self):
+        with self.assertRaises(ValueError):
+            counters.increment(self.coupons[0], 'view_count')
+
+    def test_failed_flush_keeps_the_increments(self):
+        counters.increment(self.coupons[0], 'used_count')
+        with mock.patch.object(Coupon.objects, 'filter', side_effect=RuntimeError('database down')), \
+                self.assertLogs('core.counters', 'ERROR'):
+            self.assertEqual(counters.flush(), 0)
+        self.assertEqual(counters.pending(self.coupons[0], 'used_count'), 1)
+        counters.flush()
+        self.assertEqual(Coupon.objects.get(pk=self.coupons[0].pk).used_count, 1)
+
+
+# ==================== Usage queue ====================
+class UsageQueueTests(TestCase):
+    def setUp(self):
+        self.coupon = Coupon.objects.create(store=make_store(), title='خصم', code='SAVE10')
+        spill_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spill_dir.cleanup)
+        patcher = mock.patch.object(usage_queue, 'SPILL_DIR', spill_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _queue_events(self, count):
+        for _ in range(count):
+            usage_queue._queue.put_nowait(usage_queue._event(self.coupon.id, 'copy', None, '127.0.0.1', '', 'desktop'))
+
+    def test_flush_writes_queued_events(self):
+        self._queue_events(3)
+        self.assertEqual(usage_queue.flush(), 3)
+        self.assertEqual(CouponUsage.objects.filter(coupon=self.coupon, action='copy').count(), 3)
+
+    def test_failed_write_spills_and_next_flush_replays(self):
+        self._queue_events(2)
+        with mock.patch.object(usage_queue, '_write', side_effect=RuntimeError('database down')), \
+                self.assertLogs('core.usage_queue', 'ERROR'):
+            self.assertEqual(usage_queue.flush(), 0)
+        self.assertEqual(len(os.listdir(usage_queue.SPILL_DIR)), 1)
+        self.assertFalse(CouponUsage.objects.exists())
+
+        self.assertEqual(usage_queue.flush(), 2)
+        self.assertEqual(CouponUsage.objects.count(), 2)
+        self.assertEqual(os.listdir(usage_queue.SPILL_DIR), [])
+
+
+# ==================== Notifications ====================
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='x')
+        for minutes in (3, 2, 1):
+            send_notification(minutes)
+        Notification.objects.create(title='مسودة', message='.', send_to_all=True)
+
+    def test_materialize_creates_each_row_once(self):
+        self.assertEqual(materialize_notifications(self.user), 3)
+        self.assertEqual(materialize_notifications(self.user), 0)
+        self.assertEqual(UserNotification.objects.filter(user=self.user).count(), 3)
+
+    def test_only_broadcasts_after_the_watermark_are_added(self):
+        materialize_notifications(self.user)
+        send_notification()
+        self.assertEqual(materialize_notifications(self.user), 1)
+        self.assertEqual(UserNotification.objects.filter(user=self.user).count(), 4)
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='x')
+        for minutes in (3, 2, 1):
+            send_notification(minutes)
+
+    def unread(self):
+        return UserProfile.objects.get(user=self.user).unread_notifications_count
+
+    def test_materialize_adds_new_rows_to_the_counter(self):
+        materialize_notifications(self.user)
+        materialize_notifications(self.user)
+        self.assertEqual(get_unread_count(User.objects.get(pk=self.user.pk)), 3)
+
+    def test_counter_matches_rows_when_a_visit_races(self):
+        materialize_notifications(self.user)
+        # Replay a visit that diffed before the first one inserted its rows
+        UserProfile.objects.filter(user=self.user).update(notifications_synced_at=None)
+        filter_rows = UserNotification.objects.filter
+        with mock.patch.object(
+            UserNotification.objects, 'filter',
+            lambda **kw: filter_rows(**kw).none() if 'notification_id__in' in kw else filter_rows(**kw),
+        ):
+            materialize_notifications(self.user)
+        self.assertEqual(self.unread(), 3)
+
+    def test_mark_read_decrements_once(self):
+        materialize_notifications(self.user)
+        user_notification = UserNotification.objects.filter(user=self.user).first()
+        self.assertTrue(mark_read(user_notification))
+        self.assertFalse(mark_read(user_notification))
+        self.assertEqual(self.unread(), 2)
+
+    def test_recount_fixes_drifted_counters(self):
+        materialize_notifications(self.user)
+        UserProfile.objects.filter(user=self.user).update(unread_notifications_count=10)
+        self.assertEqual(recount_unread(), 1)
+        self.assertEqual(self.unread(), 3)
+
+
+# ==================== Search ====================
+class ArabicSearchTests(TestCase):
+    def test_normalize_folds_spelling_variants(self):
+        self.assertEqual(normalize('أحمد إبراهيم آمال'), 'احمد ابراهيم امال')
+        self.assertEqual(normalize('مكتبة مستشفى'), 'مكتبه مستشفي')
+        self.assertEqual(normalize('خَصْمٌ'), 'خصم')
+        self.assertEqual(normalize('كـــوبون ٢٠٢٤'), 'كوبون 2024')
+        self.assertEqual(normalize('NOON'), 'noon')
+
+    def test_variants_strip_the_definite_article(self):
+        self.assertEqual(variants('المتجر'), ['المتجر', 'متجر'])
+        self.assertEqual(variants('الف'), ['الف'])
+        self.assertEqual(tokenize('السُّوق الحُرّة'), ['السوق', 'الحره'])
+
+    def test_search_matches_other_spellings_and_prefixes(self):
+        store = make_store('souq', name='السوق الحرة')
+        make_store('other', name='متجر آخر')
+        for query in ('الحره', 'سوق', 'السو', 'الحُرّة'):
+            self.assertEqual(list(search_stores(Store.objects.all(), query)), [store], query)
+
+    def test_prefix_is_matched_literally(self):
+        store = make_store('under_score', name='under_score')
+        make_store('underxscore', name='underxscore')
+        self.assertEqual(list(search_stores(Store.objects.all(), 'under_')), [store])
+
+    def test_every_word_must_match_and_better_fields_rank_first(self):
+        store = make_store()
+        in_title = Coupon.objects.create(store=store, title='خصم الأزياء', code='A')
+        in_description = Coupon.objects.create(store=store, title='عرض', code='B', description='خصم على الأزياء')
+        Coupon.objects.create(store=store, title='خصم الإلكترونيات', code='C')
+        found = list(search_coupons(Coupon.objects.all(), 'خصم ازياء'))
+        self.assertEqual(found, [in_title, in_description])
+
+    def test_renaming_a_store_reindexes_its_coupons(self):
+        store = make_store(name='قديم')
+        coupon = Coupon.objects.create(store=store, title='عرض', code='A')
+        store.name = 'جديد'
+        store.save()
+        self.assertEqual(list(search_coupons(Coupon.objects.all(), 'جديد')), [coupon])
+        self.assertFalse(search_coupons(Coupon.objects.all(), 'قديم').exists())
+
+
+# ==================== Keyset pagination ====================
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        store = make_store()
+        created_at = timezone.now()
+        for i in range(7):
+            coupon = Coupon.objects.create(store=store, title=f'كوبون {i}', code=f'C{i}', is_best_offer=i % 3 == 0)
+            # Ties on created_at are broken by the primary key
+            Coupon.objects.filter(pk=coupon.pk).update(created_at=created_at - timedelta(days=i // 2))
+        self.queryset = Coupon.objects.all()
+        self.expected = list(self.queryset.order_by(*KeysetPaginator(self.queryset, 3).ordering).values_list('id', flat=True))
+
+    def test_next_cursors_walk_every_row_once(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen += [coupon.id for coupon in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator = KeysetPaginator(self.queryset, 3, values=['id'])
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([row['id'] for row in back], self.expected[:3])
+        self.assertFalse(back.has_previous())
+
+    def test_malformed_cursor_gives_first_page(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        wrong_length = encode({'d': 'n', 'v': [True]})
+        bad_date = encode({'d': 'n', 'v': [True, False, 'not-a-date', 1]})
+        for cursor in ('garbage', wrong_length, bad_date):
+            page = paginator.get_page(cursor)
+            self.assertEqual([coupon.id for coupon in page], self.expected[:3])
+
+
+# ==================== Imports ====================
+class CouponImportTests(TestCase):
+    def setUp(self):
+        self.store = make_store()
+
+    def _import(self, rows, **kwargs):
+        feed = io.StringIO(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        return imports.import_coupons(feed, 'jsonl', **kwargs)
+
+    def test_upsert_on_store_and_code(self):
+        stats = self._import([{'store': 'noon', 'code': 'A1', 'title': 'خصم 10'}])
+        self.assertEqual((stats['created'], stats['updated']), (1, 0))
+
+        stats = self._import([
+            {'store': 'noon', 'code': 'A1', 'title': 'خصم 20', 'discount_percentage': '20'},
+            {'store': 'noon', 'code': 'B2', 'title': 'توصيل مجاني'},
+        ])
+        self.assertEqual((stats['created'], stats['updated']), (1, 1))
+        coupon = Coupon.objects.get(store=self.store, code='A1')
+        self.assertEqual((coupon.title, coupon.discount_percentage), ('خصم 20', 20))
+        self.assertEqual(Coupon.objects.count(), 2)
+
+        stats = self._import([{'store': 'noon', 'code': 'A1', 'title': 'خصم 20'}])
+        self.assertEqual(stats['unchanged'], 1)
+
+    def test_invalid_rows_are_reported_not_written(self):
+        stats = self._import([
+            {'store': 'missing', 'code': 'X'},
+            {'store': 'noon', 'code': 'N1', 'title': 'x', 'discount_percentage': '-5'},
+            {'store': 'noon', 'code': 'N2', 'title': 'x' * 300},
+            {'store': 'noon', 'code': 'N3', 'title': 'x', 'affiliate_url': 'not a url'},
+            {'store': 'noon', 'code': 'OK', 'title': 'صالح'},
+        ])
+        self.assertEqual(stats['skipped'], 4)
+        self.assertEqual([line for line, _ in stats['errors']], [1, 2, 3, 4])
+        self.assertEqual(list(Coupon.objects.values_list('code', flat=True)), ['OK'])
+
+    def test_dry_run_writes_nothing(self):
+        stats = self._import([{'store': 'noon', 'code': 'A1', 'title': 'خصم'}], dry_run=True)
+        self.assertEqual(stats['created'], 1)
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_imported_coupons_are_searchable(self):
+        self._import([{'store': 'noon', 'code': 'A1', 'title': 'خصم على الإلكترونيات'}])
+        self.assertEqual(search_coupons(Coupon.objects.all(), 'الالكترونيات').count(), 1)
+
+    def _import_text(self, text, fmt, **kwargs):
+        return imports.import_coupons(io.StringIO(text), fmt, batch_size=1, **kwargs)
+
+    def test_unreadable_jsonl_lines_are_reported(self):
+        feed = '\n'.join([
+            json.dumps({'store': 'noon', 'code': 'A1', 'title': 'أول'}),
+            '[1, 2]',
+            '{"store": "noon", ',
+            '"just a string"',
+            json.dumps({'store': 'noon', 'code': 'A2', 'title': 'ثاني'}),
+        ])
+        stats = self._import_text(feed, 'jsonl')
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual([line for line, _ in stats['errors']], [2, 3, 4])
+        self.assertIn('invalid JSON', stats['errors'][1][1])
+
+    def test_json_array_of_scalars_is_reported_per_item(self):
+        stats = self._import_text('[1, "x", {"store": "noon", "code": "A1"}]', 'json')
+        self.assertEqual((stats['created'], stats['skipped']), (1, 2))
+
+    def test_json_feed_must_be_an_array(self):
+        for text in ('{"store": "noon", "code": "A1"}', '[{"store": '):
+            with self.assertRaises(ValueError):
+                self._import_text(text, 'json')
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_csv_feed(self):
+        feed = 'store,code,title,is_exclusive\nnoon,A1,خصم,نعم\nnoon,A2,عرض,maybe\n'
+        stats = self._import_text(feed, 'csv')
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual([line for line, _ in stats['errors']], [3])
+        self.assertTrue(Coupon.objects.get(code='A1').is_exclusive)
+
+
+# ==================== Typeahead ====================
+class TypeaheadTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(typeahead._state, {'index': None, 'checked_at': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = make_store('shein', name='شي إن', name_en='SHEIN')
+        self.coupon = Coupon.objects.create(store=self.store, title='خصم الأزياء الصيفية', code='SUMMER20')
+
+    def titles(self, query, **limits):
+        return [(row['type'], row['title']) for row in typeahead.lookup(query, **limits)]
+
+    def test_prefix_of_any_word_matches(self):
+        for query in ('خصم', 'الازي', 'الأزياء الص', 'summ', 'she'):
+            self.assertIn(('coupon', 'خصم الأزياء الصيفية'), self.titles(query), query)
+        self.assertEqual(self.titles('she'), [('coupon', 'خصم الأزياء الصيفية'), ('store', 'شي إن')])
+        self.assertEqual(self.titles('صيفيات'), [])
+
+    def test_short_queries_and_limits(self):
+        Coupon.objects.create(store=self.store, title='خصم التوصيل', code='SHIP')
+        self.assertEqual(self.titles('خ'), [])
+        self.assertEqual(len(self.titles('خصم', coupons=1)), 1)
+        self.assertEqual(len(self.titles('خصم')), 2)
+
+    def test_saves_are_applied_without_a_rebuild(self):
+        index = typeahead.get_index()
+        with mock.patch.object(typeahead, '_build', side_effect=AssertionError('rebuilt')), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.coupon.title = 'عرض الشتاء'
+            self.coupon.save()
+            Coupon.objects.create(store=self.store, title='خصم جديد', code='NEW')
+        self.assertIs(typeahead.get_index(), index)
+        self.assertEqual(self.titles('الشتا'), [('coupon', 'عرض الشتاء')])
+        self.assertEqual(self.titles('خصم'), [('coupon', 'خصم جديد')])
+        self.assertEqual(index.keys, typeahead._build(index.version).keys)
+
+    def test_api_search_endpoint(self):
+        response = self.client.get('/api/search/', {'q': 'SUMMER'})
+        self.assertEqual([row['code'] for row in response.json()['results']], ['SUMMER20'])
+
+
+# ==================== Image derivatives ====================
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.storage = FileSystemStorage(location=media.name, base_url='/media/')
+        for cache in (images._variants, images._failed):
+            patcher = mock.patch.dict(cache, clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self, name, fmt='PNG', mode='RGB', size=(300, 300), **save_kwargs):
+        buffer = io.BytesIO()
+        Image.new(mode, size).save(buffer, fmt, **save_kwargs)
+        self.storage.save(name, ContentFile(buffer.getvalue()))
+        return SimpleNamespace(storage=self.storage, name=name)
+
+    def test_same_stem_with_other_extension_gets_its_own_files(self):
+        png = images.generate(self.upload('stores/logo.png', mode='RGBA'), 'logo')
+        jpg = images.generate(self.upload('stores/logo.jpg', fmt='JPEG', size=(100, 100)), 'logo')
+        self.assertEqual([width for width, _, _ in png], [64, 128, 256])
+        self.assertEqual(png[0][1:], ('/media/derived/64/stores/logo.png.webp', '/media/derived/64/stores/logo.png.png'))
+        self.assertEqual(jpg, [(64, '/media/derived/64/stores/logo.jpg.webp', '/media/derived/64/stores/logo.jpg.jpg')])
+
+    def test_existing_derivatives_are_not_decoded_again(self):
+        field_file = self.upload('stores/logo.png')
+        first = images.generate(field_file, 'logo')
+        with mock.patch.object(Image.Image, 'load', side_effect=AssertionError('decoded')):
+            self.assertEqual(images.generate(field_file, 'logo'), first)
+
+    def test_animated_images_are_skipped(self):
+        buffer = io.BytesIO()
+        frames = [Image.new('RGB', (200, 200), color) for color in ('red', 'blue')]
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:])
+        self.storage.save('anim.gif', ContentFile(buffer.getvalue()))
+        self.assertEqual(images.variants(SimpleNamespace(storage=self.storage, name='anim.gif'), 'logo'), [])
+        self.assertFalse(self.storage.exists('derived'))
+
+    def test_failures_are_not_cached(self):
+        field_file = self.upload('stores/logo.png')
+        with mock.patch.object(self.storage, 'save', side_effect=OSError('disk full')), \
+                self.assertLogs('core.images', 'WARNING'):
+            self.assertEqual(images.variants(field_file, 'logo'), [])
+        # Not retried on every render, but once RETRY_AFTER has passed
+        self.assertEqual(images.variants(field_file, 'logo'), [])
+        images._failed.clear()
+        self.assertEqual(len(images.variants(field_file, 'logo')), 3)
+
+
+# ==================== Analytics ====================
+class AnalyticsTests(TestCase):
+    def test_categories_with_the_same_name_are_reported_apart(self):
+        store = make_store()
+        today = timezone.localdate()
+        for slug, copies in (('a', 3), ('b', 2)):
+            category = Category.objects.create(name='أزياء', slug=slug)
+            coupon = Coupon.objects.create(store=store, category=category, title='خصم', code=slug)
+            UsageRollup.objects.create(day=today, coupon=coupon, store=store, action='copy', count=copies)
+
+        rows = analytics.build_report(7)['top_categories']
+        self.assertEqual([(row['category_name'], row['copies']) for row in rows], [('أزياء', 3), ('أزياء', 2)])
+
+    @plain_static
+    def test_dashboard_is_staff_only(self):
+        self.assertEqual(self.client.get('/admin/analytics/').status_code, 302)
+        User.objects.create_superuser('admin', password='x')
+        self.client.login(username='admin', password='x')
+        response = self.client.get('/admin/analytics/?days=7')
+        self.assertEqual(response.context['days'], 7)
+
+
+# ==================== Fragment cache ====================
+class HomepageFragmentTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_superuser('admin', password='x')
+        # Logged in, so the full-page cache is bypassed and only fragments apply
+        self.client.login(username='admin', password='x')
+        self.coupon = Coupon.objects.create(store=make_store(), title='عرض أول', code='A', is_best_offer=True)
+
+    def render(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        return response, len(queries)
+
+    def test_sections_are_served_from_the_cache(self):
+        _, cold = self.render()
+        Coupon.objects.filter(pk=self.coupon.pk).update(title='بدون إشارة')
+        response, warm = self.render()
+        self.assertLess(warm, cold)
+        self.assertContains(response, 'عرض أول')
+
+    def test_catalog_change_rebuilds_the_sections(self):
+        self.render()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.title = 'عرض ثان'
+            self.coupon.save()
+        response, _ = self.render()
+        self.assertContains(response, 'عرض ثان')
+        self.assertNotContains(response, 'عرض أول')
+
+    def test_sections_are_cached_per_language(self):
+        Coupon.objects.filter(pk=self.coupon.pk).update(title_en='First offer')
+        self.render()
+        self.client.get('/set-language/en/')
+        response, _ = self.render()
+        self.assertContains(response, 'First offer')
+
+
+# ==================== Page cache ====================
+class PageCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = make_store(name='متجر قديم')
+
+    def test_hit_is_served_without_queries(self):
+        first = self.client.get('/stores/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/stores/')
+        self.assertEqual(second.content, first.content)
+
+    def test_catalog_change_invalidates_the_page(self):
+        self.client.get('/stores/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.name = 'متجر جديد'
+            self.store.save()
+        self.assertContains(self.client.get('/stores/'), 'متجر جديد')
+
+    def test_key_varies_only_on_the_params_the_view_reads(self):
+        factory = RequestFactory()
+
+        def key(url, language=None):
+            request = factory.get(url)
+            request.session = {'language': language} if language else {}
+            return pagecache.page_key(request, 'stores', ('q', 'cursor'), {'catalog.store': 1})
+
+        self.assertEqual(key('/stores/?cursor=x&q=&utm_source=ad'), key('/stores/?cursor=x'))
+        self.assertNotEqual(key('/stores/?q=a'), key('/stores/?q=b'))
+        self.assertNotEqual(key('/stores/', 'en'), key('/stores/', 'ar'))
+
+    def test_logged_in_users_bypass_the_cache(self):
+        User.objects.create_user('member', password='x')
+        self.client.get('/stores/')
+        self.client.login(username='member', password='x')
+        Store.objects.filter(pk=self.store.pk).update(name='بدون إشارة')
+        # The update skipped the signals, so only a fresh render can show it
+        self.assertContains(self.client.get('/stores/'), 'بدون إشارة')
+
+    def test_stats_are_only_counted_when_enabled(self):
+        self.client.get('/stores/')
+        self.assertEqual(pagecache.stats()['stores']['misses'], 0)
+        with mock.patch.object(pagecache, 'RECORD_STATS', True):
+            self.client.get('/stores/?q=x')
+            self.client.get('/stores/?q=x')
+        self.assertEqual(pagecache.stats()['stores'], {'hits': 1, 'misses': 1, 'bypassed': 0, 'ratio': 0.5})
+
+
+
+# ==================== Conditional GET ====================
+class ConditionalGetTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store = make_store()
+        # A first visit sets the session cookies; revalidate as a returning visitor
+        self.first = self.client.get('/stores/')
+
+    def test_matching_etag_is_not_modified(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/stores/', HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.first['ETag'])
+
+    def test_unchanged_since_last_modified_is_not_modified(self):
+        response = self.client.get('/stores/', HTTP_IF_MODIFIED_SINCE=self.first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_moves_the_validators(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.name = 'متجر جديد'
+            self.store.save()
+        response = self.client.get('/stores/', HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.first['ETag'])
+
+    def test_revalidated_store_page_still_counts_the_visit(self):
+        etag = self.client.get('/store/noon/')['ETag']
+        with mock.patch.object(counters, 'increment') as increment:
+            response = self.client.get('/store/noon/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        increment.assert_called_once()
+
+    def test_cookie_responses_are_only_cached_privately(self):
+        self.assertIn('private', self.first['Cache-Control'])
+        response = self.client.get('/stores/?q=x')
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_logged_in_pages_have_no_validators(self):
+        User.objects.create_user('member', password='x')
+        self.client.login(username='member', password='x')
+        self.assertFalse(self.client.get('/stores/').has_header('ETag'))
+
+
+# ==================== Media ====================
+class MediaServingTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media_root = override_settings(MEDIA_ROOT=root.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(root.name, 'stores'))
+        with open(os.path.join(root.name, 'stores', 'logo.txt'), 'wb') as fh:
+            fh.write(b'0123456789')
+        self.factory = RequestFactory()
+
+    def serve(self, path='stores/logo.txt', query='', **headers):
+        return media.serve_media(self.factory.get(f'/media/{path}{query}', **headers), path)
+
+    def test_range_is_partial_content(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_suffix_range(self):
+        response = self.serve(HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_carries_the_validators(self):
+        first = self.serve()
+        response = self.serve(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Last-Modified'], first['Last-Modified'])
+        self.assertEqual(response['Cache-Control'], f'public, max-age={media.MAX_AGE}')
+
+    def test_current_hash_is_immutable(self):
+        digest = self.serve()['ETag'].strip('"')
+        self.assertIn('immutable', self.serve(query=f'?v={digest}')['Cache-Control'])
+        self.assertNotIn('immutable', self.serve(query='?v=stale')['Cache-Control'])
+
+    def test_accel_redirect_is_percent_encoded(self):
+        with open(os.path.join(settings.MEDIA_ROOT, 'stores', 'شعار.txt'), 'wb') as fh:
+            fh.write(b'x')
+        with mock.patch.object(media, 'ACCEL_REDIRECT', '/protected/'):
+            response = self.serve('stores/شعار.txt')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/stores/%D8%B4%D8%B9%D8%A7%D8%B1.txt')
+
+    def test_paths_outside_media_root_are_not_found(self):
+        with self.assertRaises(Http404):
+            self.serve('../etc/passwd')
+
+
+# ==================== API ====================
+class ApiTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store = make_store()
+            self.coupons = [
+                Coupon.objects.create(store=self.store, title=f'عرض {n}', code=f'C{n}') for n in range(5)
+            ]
+
+    def test_cursors_walk_every_coupon_once(self):
+        seen, url = [], '/api/v1/coupons/?limit=2'
+        while url:
+            data = self.client.get(url).json()
+            self.assertEqual(set(data), {'results', 'next', 'previous'})
+            seen += [row['id'] for row in data['results']]
+            url = data['next'] and f"/api/v1/coupons/?limit=2&cursor={data['next']}"
+        self.assertEqual(sorted(seen), sorted(c.pk for c in self.coupons))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        first = self.client.get('/api/v1/coupons/?limit=2').json()
+        second = self.client.get(f"/api/v1/coupons/?limit=2&cursor={first['next']}").json()
+        back = self.client.get(f"/api/v1/coupons/?limit=2&cursor={second['previous']}").json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get('/api/v1/coupons/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/coupons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_moves_the_etag(self):
+        etag = self.client.get('/api/v1/coupons/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupons[0].title = 'عرض جديد'
+            self.coupons[0].save()
+        response = self.client.get('/api/v1/coupons/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'عرض جديد')
+
+    def test_fields_narrow_the_projection(self):
+        data = self.client.get('/api/v1/coupons/?fields=id,code,unknown').json()
+        self.assertEqual({frozenset(row) for row in data['results']}, {frozenset({'id', 'code'})})
+
+    def test_store_detail_pages_its_coupons(self):
+        data = self.client.get('/api/v1/stores/noon/?limit=3').json()
+        self.assertEqual(data['store']['slug'], 'noon')
+        self.assertEqual(len(data['coupons']['results']), 3)
+        self.assertIsNotNone(data['coupons']['next'])
+        self.assertEqual(self.client.get('/api/v1/stores/missing/').status_code, 404)
+
+
+# ==================== Trending ====================
+class TrendingTests(TestCase):
+    def setUp(self):
+        store = make_store()
+        self.old = Coupon.objects.create(store=store, title='قديم', code='OLD')
+        self.new = Coupon.objects.create(store=store, title='جديد', code='NEW')
+
+    def log(self, coupon, hours_ago, count=1, action='view'):
+        when = timezone.now() - timedelta(hours=hours_ago)
+        CouponUsage.objects.bulk_create(
+            CouponUsage(coupon=coupon, action=action, created_at=when) for _ in range(count)
+        )
+
+    def test_weight_halves_every_half_life(self):
+        now = timezone.now()
+        score = trending._log_score(now, 8)
+        self.assertAlmostEqual(trending.current_weight(score, now), 8)
+        later = now + timedelta(hours=trending.HALF_LIFE_HOURS)
+        self.assertAlmostEqual(trending.current_weight(score, later), 4)
+
+    def test_recent_events_outrank_older_bursts(self):
+        # Three views two half-lives ago are worth 0.75 views now
+        self.log(self.old, 2 * trending.HALF_LIFE_HOURS, count=3)
+        self.log(self.new, 1)
+        trending.update()
+        self.assertEqual(trending.top_ids('coupon', 2), [self.new.pk, self.old.pk])
+
+    def test_action_weights(self):
+        self.log(self.old, 1, count=2)
+        self.log(self.new, 1, action='copy')
+        trending.update()
+        self.assertEqual(trending.top_ids('coupon', 1), [self.new.pk])
+
+    def test_update_consumes_each_event_once(self):
+        self.log(self.new, 1, count=2)
+        self.assertEqual(trending.update(), 2)
+        score = TrendingScore.objects.get(kind='coupon', object_id=self.new.pk).score
+        self.assertEqual(trending.update(), 0)
+        self.assertEqual(TrendingScore.objects.get(kind='coupon', object_id=self.new.pk).score, score)
+
+    def test_unsettled_events_wait_for_the_next_run(self):
+        self.log(self.old, 1)
+        self.log(self.new, 0)
+        self.assertEqual(trending.update(), 1)
+        self.assertFalse(TrendingScore.objects.filter(kind='coupon', object_id=self.new.pk).exists())
+
+    def test_incremental_updates_match_a_rebuild(self):
+        self.log(self.old, 5)
+        trending.update()
+        self.log(self.old, 2, action='click')
+        trending.update()
+        incremental = TrendingScore.objects.get(kind='coupon', object_id=self.old.pk).score
+        trending.rebuild()
+        self.assertAlmostEqual(TrendingScore.objects.get(kind='coupon', object_id=self.old.pk).score, incremental)
+
+    def test_faded_scores_are_dropped(self):
+        self.log(self.old, 20 * trending.HALF_LIFE_HOURS)
+        trending.update()
+        self.assertFalse(TrendingScore.objects.filter(kind='coupon').exists())
+
+    def test_manual_flag_until_scores_exist(self):
+        Coupon.objects.filter(pk=self.old.pk).update(is_most_used=True)
+        self.assertEqual([c.pk for c in trending.trending_coupons()], [self.old.pk])
+
+
+# ==================== Usage rollups ====================
+class UsageRollupTests(TestCase):
+    def setUp(self):
+        self.store = make_store()
+        self.coupon = Coupon.objects.create(store=self.store, title='خصم', code='A')
+        self.day = timezone.localdate() - timedelta(days=3)
+
+    def log(self, day, action='copy', device_type='mobile', count=1):
+        # Local noon, well away from the day boundaries
+        when = timezone.make_aware(datetime.combine(day, time(12)))
+        CouponUsage.objects.bulk_create(
+            CouponUsage(coupon=self.coupon, action=action, device_type=device_type, created_at=when)
+            for _ in range(count)
+        )
+
+    def counts(self):
+        return set(UsageRollup.objects.values_list('day', 'action', 'device_type', 'count'))
+
+    def test_day_is_grouped_by_action_and_device(self):
+        self.log(self.day, count=3)
+        self.log(self.day, device_type='desktop')
+        self.log(self.day, action='view')
+        self.assertEqual(rollups.rebuild_day(self.day), 3)
+        self.assertEqual(self.counts(), {
+            (self.day, 'copy', 'mobile', 3), (self.day, 'copy', 'desktop', 1), (self.day, 'view', 'mobile', 1),
+        })
+
+    def test_rebuilding_a_day_is_idempotent(self):
+        self.log(self.day, count=2)
+        rollups.rebuild_day(self.day)
+        rollups.rebuild_day(self.day)
+        self.assertEqual(self.counts(), {(self.day, 'copy', 'mobile', 2)})
+
+    def test_update_only_rebuilds_days_with_new_usage(self):
+        earlier = self.day - timedelta(days=1)
+        self.log(earlier)
+        self.log(self.day)
+        self.assertIn(earlier, rollups.update())
+
+        self.log(self.day)
+        days = rollups.update()
+        self.assertIn(self.day, days)
+        self.assertNotIn(earlier, days)
+        self.assertEqual(self.counts(), {(earlier, 'copy', 'mobile', 1), (self.day, 'copy', 'mobile', 2)})
+        self.assertNotIn(self.day, rollups.update())
+
+    def test_totals_sum_across_days(self):
+        self.log(self.day, count=2)
+        self.log(self.day - timedelta(days=1), action='view')
+        rollups.rebuild()
+        rows = rollups.totals(self.day - timedelta(days=1), self.day, 'store', 'action')
+        self.assertEqual(
+            [(row['store'], row['action'], row['total']) for row in rows],
+            [(self.store.pk, 'copy', 2), (self.store.pk, 'view', 1)],
+        )
+
+
+# ==================== Usage export ====================
+class UsageExportTests(TestCase):
+    def setUp(self):
+        self.coupon = Coupon.objects.create(store=make_store(), title='خصم', code='A')
+
+    def export(self, fmt='csv'):
+        return list(exports.export_lines(exports.usage_queryset(), fmt))
+
+    def test_formula_cells_are_neutralized(self):
+        for agent in ('=HYPERLINK("http://x")', '+1', '-2+3', '@SUM(A1)'):
+            CouponUsage.objects.create(coupon=self.coupon, user_agent=agent, ip_address='127.0.0.1')
+        rows = list(csv.DictReader(self.export()))
+        self.assertEqual(
+            [row['user_agent'] for row in rows],
+            ['\'=HYPERLINK("http://x")', "'+1", "'-2+3", "'@SUM(A1)"],
+        )
+        self.assertEqual({row['coupon_id'] for row in rows}, {str(self.coupon.pk)})
+
+    def test_plain_cells_and_numbers_are_unchanged(self):
+        usage = CouponUsage.objects.create(coupon=self.coupon, user_agent='Mozilla/5.0', device_type='mobile')
+        row = next(csv.DictReader(self.export()))
+        self.assertEqual((row['id'], row['user_agent'], row['device_type']), (str(usage.pk), 'Mozilla/5.0', 'mobile'))
+        self.assertEqual(exports._csv_cell(-5), -5)
+
+    def test_json_lines_are_not_escaped(self):
+        CouponUsage.objects.create(coupon=self.coupon, user_agent='=1')
+        self.assertEqual(json.loads(self.export('jsonl')[0])['user_agent'], '=1')
+
+    def test_rows_are_read_in_keyset_chunks(self):
+        CouponUsage.objects.bulk_create(CouponUsage(coupon=self.coupon) for _ in range(5))
+        # Three chunks of at most two rows, then the empty one that ends it
+        with self.assertNumQueries(4):
+            ids = [row[0] for row in exports.iter_rows(CouponUsage.objects.all(), chunk_size=2)]
+        self.assertEqual(ids, sorted(CouponUsage.objects.values_list('id', flat=True)))
+
+
+# ==================== Favorites ====================
+class FavoriteOverlayTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', password='x')
+        self.coupon = Coupon.objects.create(store=make_store(), title='خصم', code='A', is_best_offer=True)
+
+    def test_ids_are_cached(self):
+        Favorite.objects.create(user=self.user, coupon=self.coupon)
+        self.assertEqual(favorites.get_favorite_ids(self.user), {self.coupon.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.get_favorite_ids(self.user), {self.coupon.pk})
+
+    def test_toggle_keeps_the_cached_set_current(self):
+        self.client.login(username='admin', password='x')
+        self.assertEqual(favorites.get_favorite_ids(self.user), set())
+
+        response = self.client.post(f'/toggle-favorite/{self.coupon.pk}/')
+        self.assertEqual(response.json()['action'], 'added')
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.get_favorite_ids(self.user), {self.coupon.pk})
+
+        response = self.client.post(f'/toggle-favorite/{self.coupon.pk}/')
+        self.assertEqual(response.json()['action'], 'removed')
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.get_favorite_ids(self.user), set())
+
+    def test_homepage_overlays_the_favorites(self):
+        Favorite.objects.create(user=self.user, coupon=self.coupon)
+        self.client.login(username='admin', password='x')
+        response = self.client.get('/')
+        self.assertContains(response, f'<script id="favorite-ids" type="application/json">[{self.coupon.pk}]</script>', html=True)
+
+    def test_anonymous_visitors_have_none(self):
+        response = self.client.get('/')
+        self.assertEqual(response.context['favorite_ids'], [])
@@ -0,0 +1,144 @@
+"""
+Time-decayed trending ranking for coupons and stores.
+
+Every CouponUsage event adds ``ACTION_WEIGHTS[action]`` to the score of its
+coupon and store, and that weight halves every ``TRENDING_HALF_LIFE_HOURS``.
+Scores are stored as log2 of the weight referred to a fixed epoch, so an
+update only touches the objects that got new events (old rows keep their
+relative order without being re-decayed) and the top-N is an indexed
+``ORDER BY score DESC`` on TrendingScore.
+
+``update()`` consumes the usage log from a high-water mark (the last
+CouponUsage id seen) and is meant to run from cron via ``update_trending``.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .cache import bump_version
+from .listings import active_coupons
+from .models import CouponUsage, TrendingScore, Watermark
+from .search import order_by_rank
+
+HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72)
+ACTION_WEIGHTS = {'view': 1, 'click': 2, 'copy': 3}
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# Events younger than this may still be in an open usage_queue transaction
+SETTLE_SECONDS = 60
+# Rows whose current weight fell below this are dropped on update
+MIN_WEIGHT = 0.01
+
+WATERMARK = 'trending'
+
+
+def _log_score(when, weight):
+    return math.log2(weight) + (when - EPOCH).total_seconds() / 3600 / HALF_LIFE_HOURS
+
+
+def _log_add(a, b):
+    """log2(2**a + 2**b) without leaving log space."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_weight(score, now=None):
+    """Decayed weight of a stored ``score`` as of ``now``."""
+    return 2 ** (score - _log_score(now or timezone.now(), 1))
+
+
+# ==================== Update ====================
+def _collect(first_id, last_id):
+    coupons, stores = {}, {}
+    grouped = (
+        CouponUsage.objects
+        .filter(id__gt=first_id, id__lte=last_id)
+        .annotate(hour=TruncHour('created_at'))
+        .values_list('coupon_id', 'coupon__store_id', 'action', 'hour')
+        .annotate(events=Count('id'))
+        .order_by()
+    )
+    for coupon_id, store_id, action, hour, events in grouped.iterator():
+        # Bucket midpoint: hour resolution is plenty for a multi-day half-life
+        score = _log_score(hour + timedelta(minutes=30), ACTION_WEIGHTS.get(action, 1) * events)
+        coupons[coupon_id] = _log_add(coupons.get(coupon_id), score)
+        stores[store_id] = _log_add(stores.get(store_id), score)
+    return {'coupon': coupons, 'store': stores}
+
+
+def _merge(kind, scores, batch_size=500):
+    ids = list(scores)
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        existing = {row.object_id: row for row in TrendingScore.objects.filter(kind=kind, object_id__in=chunk)}
+        created = []
+        for object_id in chunk:
+            row = existing.get(object_id)
+            if row is None:
+                created.append(TrendingScore(kind=kind, object_id=object_id, score=scores[object_id]))
+            else:
+                row.score = _log_add(row.score, scores[object_id])
+        TrendingScore.objects.bulk_update(existing.values(), ['score', 'updated_at'])
+        TrendingScore.objects.bulk_create(created)
+
+
+def update():
+    """Fold usage events past the watermark into the scores. Returns events consumed."""
+    now = timezone.now()
+    with transaction.atomic():
+        mark, _ = Watermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        bounds = CouponUsage.objects.filter(id__gt=mark.last_id).aggregate(
+            last=Max('id'),
+            unsettled=Min('id', filter=Q(created_at__gte=now - timedelta(seconds=SETTLE_SECONDS))),
+        )
+        last_id = bounds['last']
+        if bounds['unsettled'] is not None:
+            last_id = bounds['unsettled'] - 1
+        if last_id is None or last_id <= mark.last_id:
+            return 0
+
+        consumed = CouponUsage.objects.filter(id__gt=mark.last_id, id__lte=last_id).count()
+        for kind, scores in _collect(mark.last_id, last_id).items():
+            _merge(kind, scores)
+
+        # Forget objects that have gone quiet (and ones since deleted)
+        TrendingScore.objects.filter(score__lt=_log_score(now, MIN_WEIGHT)).delete()
+
+        mark.last_id = last_id
+        mark.save(update_fields=['last_id', 'updated_at'])
+
+    bump_version(WATERMARK)
+    return consumed
+
+
+def rebuild():
+    """Drop all scores and replay the whole usage log."""
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        Watermark.objects.filter(name=WATERMARK).delete()
+    return update()
+
+
+# ==================== Read ====================
+def top_ids(kind, limit):
+    return list(
+        TrendingScore.objects.filter(kind=kind)
+        .order_by('-score')
+        .values_list('object_id', flat=True)[:limit]
+    )
+
+
+def trending_coupons(limit=8):
+    """Top active coupons by trending score; the manual flag until scores exist."""
+    # Over-fetch so inactive coupons still in the ranking don't shorten the list
+    ids = top_ids('coupon', limit * 3)
+    if not ids:
+        return active_coupons().filter(is_most_used=True)[:limit]
+    return order_by_rank(active_coupons(), ids)[:limit]
@@ -0,0 +1,189 @@
+"""
+Per-process prefix index behind /api/search/.
+
+Every word position of a store name or coupon code/title (both languages)
+is kept in one sorted list, so a keystroke is a ``bisect`` plus a short scan
+with no database access. Saves and deletes append the changed ids to a
+changelog in the shared cache and bump the ``typeahead`` version; each
+worker replays the changelog into its own index instead of rebuilding it.
+"""
+import bisect
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from .cache import LOCAL_RECHECK_SECONDS, bump_version, get_version
+from .search import normalize, tokenize
+
+CHANGELOG_TTL = 60 * 60
+MAX_REPLAY = 200
+# Change sets larger than this rebuild the index instead of patching it id by id
+MAX_INCREMENTAL = 1000
+MIN_QUERY_LENGTH = 2
+
+_lock = threading.Lock()
+_state = {'index': None, 'checked_at': 0}
+
+
+class TypeaheadIndex:
+    def __init__(self, version):
+        self.version = version
+        self.keys = []  # sorted (key, kind, id)
+        self.docs = {}  # (kind, id) -> (payload, keys)
+        # While building, keys are appended and sorted once at the end
+        self.building = False
+
+    def add(self, kind, pk, texts, payload):
+        self.remove(kind, pk)
+        keys = set()
+        for text in texts:
+            words = tokenize(text)
+            for start in range(len(words)):
+                keys.add(' '.join(words[start:]))
+        if self.building:
+            self.keys.extend((key, kind, pk) for key in keys)
+        else:
+            for key in keys:
+                bisect.insort(self.keys, (key, kind, pk))
+        self.docs[(kind, pk)] = (payload, keys)
+
+    def remove(self, kind, pk):
+        doc = self.docs.pop((kind, pk), None)
+        if doc is None:
+            return
+        for key in doc[1]:
+            pos = bisect.bisect_left(self.keys, (key, kind, pk))
+            if pos < len(self.keys) and self.keys[pos] == (key, kind, pk):
+                del self.keys[pos]
+
+    def lookup(self, query, limits):
+        prefix = ' '.join(tokenize(query))
+        results = {kind: [] for kind in limits}
+        if not prefix:
+            return results
+        seen = set()
+        pos = bisect.bisect_left(self.keys, (prefix,))
+        while pos < len(self.keys):
+            key, kind, pk = self.keys[pos]
+            if not key.startswith(prefix):
+                break
+            pos += 1
+            if (kind, pk) in seen or len(results[kind]) >= limits[kind]:
+                continue
+            seen.add((kind, pk))
+            results[kind].append(self.docs[(kind, pk)][0])
+            if all(len(results[k]) >= limits[k] for k in limits):
+                break
+        return results
+
+
+# ==================== Loading ====================
+def _load_coupons(index, ids=None):
+    from .models import Coupon
+
+    queryset = Coupon.objects.filter(is_active=True)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    rows = queryset.values('id', 'title', 'title_en', 'code', 'discount_percentage', 'store__name', 'store__name_en')
+    for row in rows.iterator():
+        index.add('coupon', row['id'], [row['title'], row['title_en'], row['code'], row['store__name'], row['store__name_en']], {
+            'type': 'coupon',
+            'title': row['title'],
+            'code': row['code'],
+            'store': row['store__name'],
+            'discount': row['discount_percentage'],
+            'url': f"/coupons/?q={row['code']}",
+        })
+
+
+def _load_stores(index, ids=None):
+    from .models import Store
+
+    queryset = Store.objects.filter(is_active=True)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    for row in queryset.values('id', 'name', 'name_en', 'slug', 'logo').iterator():
+        index.add('store', row['id'], [row['name'], row['name_en']], {
+            'type': 'store',
+            'title': row['name'],
+            'logo': default_storage.url(row['logo']) if row['logo'] else '',
+            'url': f"/store/{row['slug']}/",
+        })
+
+
+LOADERS = {'coupon': _load_coupons, 'store': _load_stores}
+
+
+def _apply(index, kind, ids):
+    for pk in ids:
+        index.remove(kind, pk)
+    LOADERS[kind](index, ids)
+
+
+def _build(version):
+    index = TypeaheadIndex(version)
+    index.building = True
+    for loader in LOADERS.values():
+        loader(index)
+    index.keys.sort()
+    index.building = False
+    return index
+
+
+def _changelog_key(version):
+    return f'core:typeahead:changes:{version}'
+
+
+def get_index():
+    """This worker's index, caught up with changes made by other workers."""
+    now = time.monotonic()
+    index = _state['index']
+    if index is not None and now - _state['checked_at'] < LOCAL_RECHECK_SECONDS:
+        return index
+
+    with _lock:
+        current = get_version('typeahead')
+        index = _state['index']
+        if index is None or current < index.version or current - index.version > MAX_REPLAY:
+            index = _build(current)
+        elif current > index.version:
+            keys = [_changelog_key(v) for v in range(index.version + 1, current + 1)]
+            changes = cache.get_many(keys)
+            if (len(changes) != len(keys)
+                    or sum(len(ids) for _, ids in changes.values()) > MAX_INCREMENTAL):
+                index = _build(current)
+            else:
+                for key in keys:
+                    kind, ids = changes[key]
+                    _apply(index, kind, ids)
+                index.version = current
+        _state.update(index=index, checked_at=now)
+    return index
+
+
+def changed(kind, ids):
+    """Record that ``ids`` of ``kind`` were saved or deleted."""
+    ids = list(ids)
+    if not ids:
+        return
+    with _lock:
+        version = bump_version('typeahead')
+        cache.set(_changelog_key(version), (kind, ids), CHANGELOG_TTL)
+        index = _state['index']
+        if index is not None and index.version == version - 1:
+            if len(ids) > MAX_INCREMENTAL:
+                # Rebuilt on the next lookup
+                _state['index'] = None
+            else:
+                _apply(index, kind, ids)
+                index.version = version
+
+
+def lookup(query, coupons=5, stores=3):
+    """Typeahead results for ``query`` in the api_search response format."""
+    if len(normalize(query).strip()) < MIN_QUERY_LENGTH:
+        return []
+    found = get_index().lookup(query, {'coupon': coupons, 'store': stores})
+    return found['coupon'] + found['store']
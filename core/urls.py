@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
 from .views_setup import initial_setup
 
+# The small AJAX endpoints run on the event loop under the ASGI profile
+ajax = views_async if settings.SERVER_PROFILE == 'asgi' else views
+
 urlpatterns = [
     # Setup page (must be first)
     path('setup/', initial_setup, name='initial_setup'),
@@ -15,8 +19,8 @@ urlpatterns = [
     path('search/', views.search, name='search'),
     
     # User Actions
-    path('copy-coupon/<int:coupon_id>/', views.copy_coupon, name='copy_coupon'),
-    path('toggle-favorite/<int:coupon_id>/', views.toggle_favorite, name='toggle_favorite'),
+    path('copy-coupon/<int:coupon_id>/', ajax.copy_coupon, name='copy_coupon'),
+    path('toggle-favorite/<int:coupon_id>/', ajax.toggle_favorite, name='toggle_favorite'),
     path('favorites/', views.favorites, name='favorites'),
     path('notifications/', views.notifications, name='notifications'),
     path('mark-notification-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
@@ -37,6 +41,13 @@ urlpatterns = [
     path('set-language/<str:lang>/', views.set_language, name='set_language'),
     
     # API
-    path('api/search/', views.api_search, name='api_search'),
-    path('api/notifications/count/', views.get_unread_notifications_count, name='notifications_count'),
+    path('api/search/', ajax.api_search, name='api_search'),
+    path('api/notifications/count/', ajax.get_unread_notifications_count, name='notifications_count'),
+
+    # API v1 (read-only JSON for the mobile app)
+    path('api/v1/home/', api.home, name='api_home'),
+    path('api/v1/categories/', api.categories, name='api_categories'),
+    path('api/v1/stores/', api.stores, name='api_stores'),
+    path('api/v1/stores/<slug:slug>/', api.store_detail, name='api_store_detail'),
+    path('api/v1/coupons/', api.coupons, name='api_coupons'),
 ]
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Asynchronous ingestion of CouponUsage events.
+
+Requests only ``enqueue()`` a plain dict; a background thread drains the
+bounded queue and writes rows with ``bulk_create`` in batches. When the
+database is unavailable a batch is appended to a JSON-lines spill file and
+replayed by the next successful flush (from any worker).
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = getattr(settings, 'USAGE_QUEUE_MAX_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'USAGE_BATCH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'USAGE_FLUSH_INTERVAL', 5)
+PUT_TIMEOUT = getattr(settings, 'USAGE_QUEUE_PUT_TIMEOUT', 0.05)
+SPILL_DIR = getattr(settings, 'USAGE_SPILL_DIR', os.path.join(settings.BASE_DIR, 'var', 'usage_spill'))
+USER_AGENT_MAX_LENGTH = 512
+
+_queue = queue.Queue(maxsize=MAX_SIZE)
+_wakeup = threading.Event()
+_stop = threading.Event()
+_flush_lock = threading.Lock()
+_start_lock = threading.Lock()
+_thread = None
+
+
+def _event(coupon_id, action, user_id, ip_address, user_agent, device_type):
+    return {
+        'coupon_id': coupon_id,
+        'user_id': user_id,
+        'action': action,
+        'ip_address': ip_address,
+        'user_agent': (user_agent or '')[:USER_AGENT_MAX_LENGTH],
+        'device_type': device_type,
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def _put_or_spill(event):
+    # Backpressure: give the flusher a moment to drain, then spill
+    _wakeup.set()
+    try:
+        _queue.put(event, timeout=PUT_TIMEOUT)
+    except queue.Full:
+        logger.warning('Usage queue full, spilling event to disk')
+        _spill([event])
+
+
+def enqueue(coupon_id, action, user_id=None, ip_address=None, user_agent='', device_type=''):
+    """Queue one usage event. Never touches the database."""
+    event = _event(coupon_id, action, user_id, ip_address, user_agent, device_type)
+    _ensure_thread()
+
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        _put_or_spill(event)
+        return
+
+    if _queue.qsize() >= BATCH_SIZE:
+        _wakeup.set()
+
+
+async def aenqueue(coupon_id, action, user_id=None, ip_address=None, user_agent='', device_type=''):
+    """``enqueue()`` for async views: the backpressure wait and spill run off the event loop."""
+    event = _event(coupon_id, action, user_id, ip_address, user_agent, device_type)
+    _ensure_thread()
+
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        await sync_to_async(_put_or_spill, thread_sensitive=False)(event)
+        return
+
+    if _queue.qsize() >= BATCH_SIZE:
+        _wakeup.set()
+
+
+def _drain(limit):
+    events = []
+    while len(events) < limit:
+        try:
+            events.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return events
+
+
+def _write(events):
+    from django.contrib.auth.models import User
+    from .models import Coupon, CouponUsage
+
+    rows = []
+    for event in events:
+        fields = dict(event)
+        fields['created_at'] = datetime.fromisoformat(fields['created_at'])
+        rows.append(CouponUsage(**fields))
+    try:
+        CouponUsage.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    except IntegrityError:
+        # A coupon or user was deleted after the event was queued
+        coupon_ids = set(Coupon.objects.filter(id__in={r.coupon_id for r in rows}).values_list('id', flat=True))
+        user_ids = set(User.objects.filter(id__in={r.user_id for r in rows}).values_list('id', flat=True))
+        for row in rows:
+            if row.user_id not in user_ids:
+                row.user_id = None
+        rows = [row for row in rows if row.coupon_id in coupon_ids]
+        CouponUsage.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def flush():
+    """Write everything queued so far. Returns the number of rows written."""
+    written = 0
+    with _flush_lock:
+        while True:
+            events = _drain(BATCH_SIZE)
+            if not events:
+                break
+            try:
+                _write(events)
+            except Exception:
+                logger.exception('Usage flush failed, spilling %d events', len(events))
+                _spill(events + _drain(MAX_SIZE))
+                return written
+            written += len(events)
+        written += _replay_spill()
+    return written
+
+
+# ==================== Spill file ====================
+def _spill(events):
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    path = os.path.join(SPILL_DIR, f'usage-{os.getpid()}.jsonl')
+    with open(path, 'a', encoding='utf-8') as fh:
+        for event in events:
+            fh.write(json.dumps(event) + '\n')
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def _replay_spill():
+    if not os.path.isdir(SPILL_DIR):
+        return 0
+
+    written = 0
+    for name in sorted(os.listdir(SPILL_DIR)):
+        if not name.startswith('usage-') or not name.endswith('.jsonl'):
+            continue
+        # Claim the file atomically so only one worker replays it
+        claimed = os.path.join(SPILL_DIR, f'replay-{uuid.uuid4().hex}.jsonl.tmp')
+        try:
+            os.rename(os.path.join(SPILL_DIR, name), claimed)
+        except FileNotFoundError:
+            continue
+
+        with open(claimed, encoding='utf-8') as fh:
+            events = [json.loads(line) for line in fh if line.strip()]
+        for start in range(0, len(events), BATCH_SIZE):
+            try:
+                _write(events[start:start + BATCH_SIZE])
+            except Exception:
+                logger.exception('Replaying %s failed, keeping the rest for later', name)
+                _spill(events[start:])
+                os.remove(claimed)
+                return written
+            written += len(events[start:start + BATCH_SIZE])
+        os.remove(claimed)
+    return written
+
+
+# ==================== Background flusher ====================
+def _run():
+    while not _stop.is_set():
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+        close_old_connections()
+
+
+def _ensure_thread():
+    # Started lazily so it lives in the gunicorn worker, not the master
+    global _thread
+    if _thread is not None:
+        return
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name='usage-flusher', daemon=True)
+            _thread.start()
+
+
+def shutdown():
+    """Stop the background flusher and write whatever is still queued."""
+    _stop.set()
+    _wakeup.set()
+    flush()
+
+
+atexit.register(shutdown)
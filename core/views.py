@@ -7,18 +7,31 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.utils import timezone
+from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
+from django.conf import settings as django_settings
 from .models import (
     Category, Store, Coupon, SliderItem, Favorite,
-    Notification, UserNotification, AppSettings, CouponUsage,
+    UserNotification, AppSettings,
     UserProfile, ContactMessage
 )
+from . import counters, trending, typeahead, usage_queue
+from .notifications import materialize_notifications, mark_read, get_unread_count
+from .listings import coupon_listing, active_coupons, with_active_coupons_count
+from .search import search_coupons, search_stores
+from .cache import get_catalog_versions, get_version
+from .favorites import get_favorite_ids
+from .pagination import KeysetPaginator
+from .conditional import conditional_page
+from .pagecache import cached_page
 import json
 
 # اضافة جديدة للتحقق من الاعداد الاولي
 from .views_setup import is_setup_complete
 
+NOTIFICATIONS_PER_PAGE = 20
+FRAGMENT_CACHE_TIMEOUT = getattr(django_settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+
 
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -48,28 +61,28 @@ def set_language(request, lang):
     return redirect(request.META.get('HTTP_REFERER', 'index'))
 
 
+@cached_page(versions=('trending',))
 def index(request):
     # التحقق من الاعداد الاولي - تحويل لصفحة الاعداد لو اول مرة
     if not is_setup_complete():
         return redirect('initial_setup')
     
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     if settings.maintenance_mode and not request.user.is_staff:
         return render(request, 'core/maintenance.html', {'settings': settings})
     
     slider_items = SliderItem.objects.filter(is_active=True)[:5]
-    best_coupons = Coupon.objects.filter(is_active=True, is_best_offer=True)[:8]
-    most_used_coupons = Coupon.objects.filter(is_active=True, is_most_used=True)[:8]
-    latest_coupons = Coupon.objects.filter(is_active=True).order_by('-created_at')[:8]
-    featured_stores = Store.objects.filter(is_active=True, is_featured=True)[:8]
-    categories = Category.objects.filter(is_active=True)[:8]
+    best_coupons = active_coupons().filter(is_best_offer=True)[:8]
+    # Evaluated only when the cached section is rendered
+    most_used_coupons = SimpleLazyObject(lambda: list(trending.trending_coupons(8)))
+    latest_coupons = active_coupons().order_by('-created_at')[:8]
+    featured_stores = with_active_coupons_count(Store.objects.filter(is_active=True, is_featured=True))[:8]
+    categories = with_active_coupons_count(Category.objects.filter(is_active=True))[:8]
     
-    # Get user favorites
-    user_favorites = []
-    if request.user.is_authenticated:
-        user_favorites = list(request.user.favorites.values_list('coupon_id', flat=True))
+    # Get user favorites (overlaid by JS so cached sections stay shareable)
+    favorite_ids = sorted(get_favorite_ids(request.user))
     
     context = {
         'settings': settings,
@@ -80,29 +93,36 @@ def index(request):
         'latest_coupons': latest_coupons,
         'featured_stores': featured_stores,
         'categories': categories,
-        'user_favorites': user_favorites,
+        'user_favorites': (),
+        'favorite_ids': favorite_ids,
+        'catalog_versions': get_catalog_versions(),
+        'settings_version': get_version('app_settings'),
+        'trending_version': get_version('trending'),
+        'fragment_timeout': FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'core/index.html', context)
 
 
+@conditional_page
+@cached_page(params=('q', 'cursor'))
 def stores(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
-    stores_list = Store.objects.filter(is_active=True)
+    stores_list = with_active_coupons_count(Store.objects.filter(is_active=True))
     
     # Search
     search_query = request.GET.get('q', '')
     if search_query:
-        stores_list = stores_list.filter(
-            Q(name__icontains=search_query) | 
-            Q(name_en__icontains=search_query)
-        )
+        stores_list = search_stores(stores_list, search_query)
     
-    # Pagination
-    paginator = Paginator(stores_list, settings.stores_per_page)
-    page = request.GET.get('page')
-    stores_page = paginator.get_page(page)
+    # Pagination (keyset cursors; the total is cached per catalog version)
+    versions = get_catalog_versions()
+    paginator = KeysetPaginator(
+        stores_list, settings.stores_per_page,
+        count_version=f"{versions['store']}.{versions['coupon']}"
+    )
+    stores_page = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'settings': settings,
@@ -113,22 +133,27 @@ def stores(request):
     return render(request, 'core/stores.html', context)
 
 
+def _count_store_visit(request, slug):
+    # A revalidated store page is still a visit
+    store_id = Store.objects.filter(slug=slug, is_active=True).values_list('pk', flat=True).first()
+    if store_id:
+        counters.increment(Store(pk=store_id), 'click_count')
+
+
+@conditional_page(not_modified=_count_store_visit)
 def store_detail(request, slug):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     store = get_object_or_404(Store, slug=slug, is_active=True)
     
-    # Increment click count
-    store.click_count += 1
-    store.save(update_fields=['click_count'])
+    # Increment click count (buffered, written by core.counters)
+    counters.increment(store, 'click_count')
     
-    coupons = store.coupons.filter(is_active=True)
+    coupons = coupon_listing(store.coupons.filter(is_active=True))
     
     # Get user favorites
-    user_favorites = []
-    if request.user.is_authenticated:
-        user_favorites = list(request.user.favorites.values_list('coupon_id', flat=True))
+    user_favorites = get_favorite_ids(request.user)
     
     context = {
         'settings': settings,
@@ -140,11 +165,13 @@ def store_detail(request, slug):
     return render(request, 'core/store_detail.html', context)
 
 
+@conditional_page
+@cached_page(params=('q', 'cursor', 'category', 'store'))
 def coupons(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
-    coupons_list = Coupon.objects.filter(is_active=True)
+    coupons_list = active_coupons()
     categories = Category.objects.filter(is_active=True)
     stores_list = Store.objects.filter(is_active=True)
     
@@ -160,22 +187,18 @@ def coupons(request):
         coupons_list = coupons_list.filter(store__slug=store_slug)
     
     if search_query:
-        coupons_list = coupons_list.filter(
-            Q(title__icontains=search_query) | 
-            Q(title_en__icontains=search_query) |
-            Q(code__icontains=search_query) |
-            Q(store__name__icontains=search_query)
-        )
+        coupons_list = search_coupons(coupons_list, search_query)
     
     # Get user favorites
-    user_favorites = []
-    if request.user.is_authenticated:
-        user_favorites = list(request.user.favorites.values_list('coupon_id', flat=True))
+    user_favorites = get_favorite_ids(request.user)
     
-    # Pagination
-    paginator = Paginator(coupons_list, settings.coupons_per_page)
-    page = request.GET.get('page')
-    coupons_page = paginator.get_page(page)
+    # Pagination (keyset cursors; the total is cached per catalog version)
+    versions = get_catalog_versions()
+    paginator = KeysetPaginator(
+        coupons_list, settings.coupons_per_page,
+        count_version=f"{versions['coupon']}.{versions['store']}.{versions['category']}"
+    )
+    coupons_page = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'settings': settings,
@@ -191,22 +214,25 @@ def coupons(request):
     return render(request, 'core/coupons.html', context)
 
 
+@conditional_page
+@cached_page(params=('cursor',))
 def category_coupons(request, slug):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     category = get_object_or_404(Category, slug=slug, is_active=True)
-    coupons_list = Coupon.objects.filter(category=category, is_active=True)
+    coupons_list = active_coupons().filter(category=category)
     
     # Get user favorites
-    user_favorites = []
-    if request.user.is_authenticated:
-        user_favorites = list(request.user.favorites.values_list('coupon_id', flat=True))
+    user_favorites = get_favorite_ids(request.user)
     
-    # Pagination
-    paginator = Paginator(coupons_list, settings.coupons_per_page)
-    page = request.GET.get('page')
-    coupons_page = paginator.get_page(page)
+    # Pagination (keyset cursors; the total is cached per catalog version)
+    versions = get_catalog_versions()
+    paginator = KeysetPaginator(
+        coupons_list, settings.coupons_per_page,
+        count_version=f"{versions['coupon']}.{versions['store']}.{versions['category']}"
+    )
+    coupons_page = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'settings': settings,
@@ -223,19 +249,18 @@ def copy_coupon(request, coupon_id):
     try:
         coupon = get_object_or_404(Coupon, id=coupon_id, is_active=True)
         
-        # Log usage
-        CouponUsage.objects.create(
-            coupon=coupon,
-            user=request.user if request.user.is_authenticated else None,
+        # Log usage (queued, written in batches by core.usage_queue)
+        usage_queue.enqueue(
+            coupon_id=coupon.id,
+            user_id=request.user.id if request.user.is_authenticated else None,
             action='copy',
             ip_address=get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
             device_type=get_device_type(request)
         )
         
-        # Increment used count
-        coupon.used_count += 1
-        coupon.save(update_fields=['used_count'])
+        # Increment used count (buffered, written by core.counters)
+        counters.increment(coupon, 'used_count')
         
         return JsonResponse({
             'success': True,
@@ -248,15 +273,20 @@ def copy_coupon(request, coupon_id):
 
 @login_required
 def favorites(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     favorites_list = Favorite.objects.filter(user=request.user).select_related('coupon', 'coupon__store')
     
+    # Pagination
+    paginator = Paginator(favorites_list, settings.coupons_per_page)
+    page = request.GET.get('page')
+    favorites_page = paginator.get_page(page)
+    
     context = {
         'settings': settings,
         'lang': lang,
-        'favorites': favorites_list,
+        'favorites': favorites_page,
     }
     return render(request, 'core/favorites.html', context)
 
@@ -282,27 +312,25 @@ def toggle_favorite(request, coupon_id):
 
 @login_required
 def notifications(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
-    # Get all sent notifications
-    all_notifications = Notification.objects.filter(is_sent=True, send_to_all=True)
-    
-    # Create user notifications if they don't exist
-    for notification in all_notifications:
-        UserNotification.objects.get_or_create(
-            user=request.user,
-            notification=notification
-        )
+    # Create user notifications for broadcasts sent since the last visit
+    materialize_notifications(request.user)
     
     user_notifications = UserNotification.objects.filter(
         user=request.user
     ).select_related('notification').order_by('-created_at')
     
+    # Pagination
+    paginator = Paginator(user_notifications, NOTIFICATIONS_PER_PAGE)
+    page = request.GET.get('page')
+    notifications_page = paginator.get_page(page)
+    
     context = {
         'settings': settings,
         'lang': lang,
-        'notifications': user_notifications,
+        'notifications': notifications_page,
     }
     return render(request, 'core/notifications.html', context)
 
@@ -316,9 +344,7 @@ def mark_notification_read(request, notification_id):
             id=notification_id, 
             user=request.user
         )
-        user_notification.is_read = True
-        user_notification.read_at = timezone.now()
-        user_notification.save()
+        mark_read(user_notification)
         
         return JsonResponse({'success': True})
     except Exception as e:
@@ -326,7 +352,7 @@ def mark_notification_read(request, notification_id):
 
 
 def search(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     query = request.GET.get('q', '')
@@ -335,24 +361,11 @@ def search(request):
     stores_results = []
     
     if query:
-        coupons_results = Coupon.objects.filter(
-            Q(title__icontains=query) |
-            Q(title_en__icontains=query) |
-            Q(code__icontains=query) |
-            Q(description__icontains=query),
-            is_active=True
-        )[:20]
-        
-        stores_results = Store.objects.filter(
-            Q(name__icontains=query) |
-            Q(name_en__icontains=query),
-            is_active=True
-        )[:10]
+        coupons_results = search_coupons(active_coupons(), query, limit=20)
+        stores_results = search_stores(Store.objects.filter(is_active=True), query, limit=10)
     
     # Get user favorites
-    user_favorites = []
-    if request.user.is_authenticated:
-        user_favorites = list(request.user.favorites.values_list('coupon_id', flat=True))
+    user_favorites = get_favorite_ids(request.user)
     
     context = {
         'settings': settings,
@@ -367,7 +380,7 @@ def search(request):
 
 # Auth Views
 def register_view(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     if not settings.enable_registration:
@@ -403,7 +416,7 @@ def register_view(request):
 
 
 def login_view(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     if request.user.is_authenticated:
@@ -441,7 +454,7 @@ def logout_view(request):
 
 @login_required
 def profile(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     if request.method == 'POST':
@@ -475,8 +488,9 @@ def profile(request):
 
 
 # Static Pages
+@conditional_page
 def about(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     context = {
@@ -486,8 +500,9 @@ def about(request):
     return render(request, 'core/about.html', context)
 
 
+@conditional_page
 def privacy(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     context = {
@@ -497,8 +512,9 @@ def privacy(request):
     return render(request, 'core/privacy.html', context)
 
 
+@conditional_page
 def terms(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     context = {
@@ -509,7 +525,7 @@ def terms(request):
 
 
 def contact(request):
-    settings = AppSettings.get_settings()
+    settings = AppSettings.get_cached()
     lang = get_current_language(request)
     
     if request.method == 'POST':
@@ -544,38 +560,8 @@ def api_search(request):
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    coupons = Coupon.objects.filter(
-        Q(title__icontains=query) |
-        Q(code__icontains=query) |
-        Q(store__name__icontains=query),
-        is_active=True
-    )[:5]
-    
-    stores = Store.objects.filter(
-        Q(name__icontains=query) |
-        Q(name_en__icontains=query),
-        is_active=True
-    )[:3]
-    
-    results = []
-    
-    for coupon in coupons:
-        results.append({
-            'type': 'coupon',
-            'title': coupon.title,
-            'code': coupon.code,
-            'store': coupon.store.name,
-            'discount': coupon.discount_percentage,
-            'url': f'/coupons/?q={coupon.code}'
-        })
-    
-    for store in stores:
-        results.append({
-            'type': 'store',
-            'title': store.name,
-            'logo': store.logo.url if store.logo else '',
-            'url': f'/store/{store.slug}/'
-        })
+    # Served from the in-process prefix index (core.typeahead), no queries
+    results = typeahead.lookup(query, coupons=5, stores=3)
     
     return JsonResponse({'results': results})
 
@@ -584,9 +570,6 @@ def get_unread_notifications_count(request):
     if not request.user.is_authenticated:
         return JsonResponse({'count': 0})
     
-    count = UserNotification.objects.filter(
-        user=request.user,
-        is_read=False
-    ).count()
+    count = get_unread_count(request.user)
     
     return JsonResponse({'count': count})
\ No newline at end of file
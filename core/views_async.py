@@ -0,0 +1,101 @@
+"""
+Async versions of the small AJAX endpoints, routed in place of the ones in
+``core.views`` under the ASGI server profile (``SERVER_PROFILE=asgi``).
+
+Under WSGI an async view costs an event loop per request, so the sync
+profile keeps the plain views. Django 4.2's ``require_POST`` and
+``login_required`` don't wrap async views, so those checks are inline.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+
+from . import counters, typeahead, usage_queue
+from .models import Coupon, Favorite
+from .notifications import aget_unread_count
+from .views import get_client_ip, get_device_type
+
+
+async def get_request_user(request):
+    """``request.user`` loaded off the event loop (``request.auser()`` arrives in Django 5.0)."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def copy_coupon(request, coupon_id):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        user = await get_request_user(request)
+        coupon = await Coupon.objects.select_related('store').only(
+            'id', 'code', 'affiliate_url', 'store__url'
+        ).filter(id=coupon_id, is_active=True).afirst()
+        if coupon is None:
+            raise Http404('No Coupon matches the given query.')
+
+        # Log usage; a full queue is waited on / spilled off the event loop
+        await usage_queue.aenqueue(
+            coupon_id=coupon.id,
+            user_id=user.id if user.is_authenticated else None,
+            action='copy',
+            ip_address=get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            device_type=get_device_type(request)
+        )
+
+        # Increment used count (buffered, written by core.counters)
+        counters.increment(coupon, 'used_count')
+
+        return JsonResponse({
+            'success': True,
+            'code': coupon.code,
+            'redirect_url': coupon.get_redirect_url()
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+async def toggle_favorite(request, coupon_id):
+    user = await get_request_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        coupon = await Coupon.objects.only('id').filter(id=coupon_id).afirst()
+        if coupon is None:
+            raise Http404('No Coupon matches the given query.')
+        favorite, created = await Favorite.objects.aget_or_create(
+            user=user,
+            coupon=coupon
+        )
+
+        if not created:
+            await favorite.adelete()
+            return JsonResponse({'success': True, 'action': 'removed'})
+
+        return JsonResponse({'success': True, 'action': 'added'})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+
+async def api_search(request):
+    query = request.GET.get('q', '')
+
+    if len(query) < 2:
+        return JsonResponse({'results': []})
+
+    # Run off the loop because the index (re)loads from the database after changes
+    results = await sync_to_async(typeahead.lookup)(query, coupons=5, stores=3)
+
+    return JsonResponse({'results': results})
+
+
+async def get_unread_notifications_count(request):
+    user = await get_request_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'count': 0})
+
+    count = await aget_unread_count(user)
+
+    return JsonResponse({'count': count})
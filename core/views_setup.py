@@ -2,11 +2,37 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib import messages
 from core.models import AppSettings
+from core.cache import LOCAL_RECHECK_SECONDS, get_version, bump_version
+import time
+
+
+# Once a superuser exists setup never "un-completes", so the positive answer
+# is latched per process and only cleared through reset_setup_state().
+_setup_latch = {'version': None, 'checked_at': 0}
 
 
 def is_setup_complete():
     """Check if initial setup is done"""
-    return User.objects.filter(is_superuser=True).exists()
+    now = time.monotonic()
+    if _setup_latch['version'] is not None:
+        if now - _setup_latch['checked_at'] < LOCAL_RECHECK_SECONDS:
+            return True
+        if get_version('setup') == _setup_latch['version']:
+            _setup_latch['checked_at'] = now
+            return True
+
+    version = get_version('setup')
+    if User.objects.filter(is_superuser=True).exists():
+        _setup_latch.update(version=version, checked_at=now)
+        return True
+    _setup_latch['version'] = None
+    return False
+
+
+def reset_setup_state():
+    """Drop the latched setup state in every worker"""
+    _setup_latch['version'] = None
+    bump_version('setup')
 
 
 def initial_setup(request):
@@ -59,6 +85,7 @@ def initial_setup(request):
                 email=email,
                 password=password1
             )
+            reset_setup_state()
             
             # إنشاء إعدادات التطبيق
             settings, created = AppSettings.objects.get_or_create(pk=1)
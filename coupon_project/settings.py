@@ -67,11 +67,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'coupon_project.wsgi.application'
 
+# wsgi (default) or asgi; see gunicorn.conf.py. The small AJAX endpoints are
+# routed to their async versions (core.views_async) only under asgi.
+SERVER_PROFILE = os.environ.get('SERVER_PROFILE', 'wsgi')
+
 # Database
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
+    # Under ASGI requests hop between threads and each thread would keep its own
+    # persistent connection, so they are only reused with the sync profile
+    DB_CONN_MAX_AGE = 0 if SERVER_PROFILE == 'asgi' else 600
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=600)
+        'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE)
     }
 else:
     DATABASES = {
@@ -81,6 +88,54 @@ else:
         }
     }
 
+# Cache
+# Must be shared between gunicorn workers so invalidations reach every process
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        # Version counters (core.cache); keep Redis on a noeviction/volatile-* policy
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'versions',
+            'TIMEOUT': None,
+        },
+    }
+else:
+    CACHE_DIR = Path(os.environ.get('CACHE_DIR', BASE_DIR / '.cache'))
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            # Pages and fragments fill the default 300 entries quickly
+            'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10},
+        },
+        # Version counters (core.cache) live apart so culling the page and
+        # fragment entries can never reset them to an old number
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR / 'versions',
+            'TIMEOUT': None,
+        },
+    }
+
+# Seconds a worker trusts its in-memory copy before re-checking the shared cache
+LOCAL_CACHE_RECHECK_SECONDS = int(os.environ.get('LOCAL_CACHE_RECHECK_SECONDS', '5'))
+
+# max-age sent with anonymous catalog pages (core.conditional); they revalidate with ETags after that
+CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', '60'))
+
+# Seconds a rendered anonymous page stays in the page cache (core.pagecache); changes invalidate it sooner
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '300'))
+
+# Count page cache hits/misses for manage.py page_cache_stats. Off by default: it is
+# a cache write per request, and the counts are approximate without Redis (atomic incr)
+PAGE_CACHE_STATS = os.environ.get('PAGE_CACHE_STATS', 'False') == 'True'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -105,6 +160,14 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+DEFAULT_FILE_STORAGE = 'core.storage.MediaStorage'
+
+# Media serving (core.media). Behind nginx set MEDIA_ACCEL_REDIRECT to an
+# `internal` location aliased to MEDIA_ROOT (e.g. /protected-media/); behind
+# Apache/lighttpd set MEDIA_SENDFILE_HEADER=X-Sendfile.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', '3600'))
 
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
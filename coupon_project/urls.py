@@ -1,8 +1,12 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import render
+from core.admin import admin_analytics_view
+from core.media import serve_media
 
 # Guide view
 def admin_guide_view(request):
@@ -10,6 +14,7 @@ def admin_guide_view(request):
 
 urlpatterns = [
     # Admin URLs - MUST BE FIRST
+    path('admin/analytics/', admin.site.admin_view(admin_analytics_view), name='admin_analytics'),
     path('admin/', admin.site.urls),
     
     # Core App URLs
@@ -18,4 +23,7 @@ urlpatterns = [
 
 # Static and Media files (always include, not just in DEBUG)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Media: ETag/Range/immutable caching and proxy handoff (core.media)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+]
\ No newline at end of file
@@ -0,0 +1,24 @@
+# Picked up automatically by gunicorn from the project root.
+import os
+
+# Server profile, chosen with SERVER_PROFILE:
+#   wsgi (default) - sync workers on coupon_project.wsgi, one request per worker.
+#   asgi           - uvicorn workers on coupon_project.asgi. The AJAX endpoints are
+#                    routed to core.views_async (api_search, copy_coupon,
+#                    toggle_favorite and get_unread_notifications_count) and run
+#                    on the event loop, so one worker keeps thousands of them in
+#                    flight; the sync pages run in a thread pool (ASGI_THREADS).
+#                    Persistent DB connections are turned off in this profile
+#                    (see settings.py).
+if os.environ.get('SERVER_PROFILE') == 'asgi':
+    wsgi_app = 'coupon_project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'coupon_project.wsgi:application'
+
+
+def worker_exit(server, worker):
+    # Write buffered counters and usage events before the worker goes away
+    from core import counters, usage_queue
+    counters.shutdown()
+    usage_queue.shutdown()